@@ -0,0 +1,291 @@
+"""End-to-end latency and throughput of the hot API endpoints.
+
+Usage: python benchmarks/api.py [--concurrency 8] [--requests 500] [--output baseline.json]
+       python benchmarks/api.py --compare baseline.json [--threshold 0.10]
+       python benchmarks/api.py --database-url postgresql://localhost/re_lease_bench
+
+Runs the app in-process over ASGI (lifespan included) against a database
+filled by re_lease.synthetic_data. The default is a throwaway SQLite file;
+--database-url points it at e.g. a local Postgres, which is migrated and
+populated on first use only. Each scenario issues --requests requests from
+--concurrency clients after a short warmup and reports throughput and
+p50/p95/p99 latency.
+
+--output writes the results as JSON. --compare reads such a file, prints
+the deltas, and exits 1 when any scenario's p95 grows or its throughput
+drops by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import timedelta
+
+warnings.filterwarnings("ignore")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+SEARCH_TERMS = ["apartment", "sunny studio", "parking", "quiet campus", "loft downtown", "renov"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Fixture:
+    """Ids and tokens the scenarios draw from, all chosen from a seeded RNG"""
+
+    def __init__(self, users, listings, password, seed):
+        from re_lease.services.users import create_access_token
+
+        self.password = password
+        self.rng = random.Random(seed)
+        self.users = users
+        self.listings = listings
+        self.tokens = {
+            user_id: create_access_token(username, user_id, timedelta(hours=2))
+            for user_id, username in users
+        }
+        self.liked = []
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def auth(self, user_id):
+        return {'Authorization': f'Bearer {self.tokens[user_id]}'}
+
+    def listing(self):
+        return self.rng.choice(self.listings)
+
+
+def browse(client, fx):
+    return client.get('/listings/', params={'limit': 20})
+
+def browse_filtered(client, fx):
+    low = fx.rng.randrange(500, 2000, 50)
+    return client.get('/listings/', params={
+        'min_price': low, 'max_price': low + fx.rng.randrange(200, 1500, 50),
+        'bedrooms': fx.rng.randint(1, 4), 'limit': 20
+    })
+
+def search(client, fx):
+    return client.get('/listings/', params={'search': fx.rng.choice(SEARCH_TERMS), 'limit': 20})
+
+def listing_detail(client, fx):
+    user_id, _ = fx.user()
+    return client.get(f'/listings/{fx.listing()[0]}', headers=fx.auth(user_id))
+
+def login(client, fx):
+    _, username = fx.user()
+    return client.post('/auth/token', data={'username': username, 'password': fx.password})
+
+def send_message(client, fx):
+    listing_id, owner_id = fx.listing()
+    user_id, _ = fx.user()
+    while user_id == owner_id:
+        user_id, _ = fx.user()
+    return client.post('/listings/messages', headers=fx.auth(user_id), json={
+        'receiver_id': owner_id, 'listing_id': listing_id, 'text': 'Is this still available?'
+    })
+
+def conversations(client, fx):
+    user_id, _ = fx.user()
+    return client.get('/listings/messages/conversations', headers=fx.auth(user_id))
+
+def like(client, fx):
+    user_id, _ = fx.user()
+    listing_id = fx.listing()[0]
+    fx.liked.append((user_id, listing_id))
+    return client.post(f'/listings/{listing_id}/like', headers=fx.auth(user_id))
+
+def unlike(client, fx):
+    user_id, listing_id = fx.liked.pop() if fx.liked else (fx.user()[0], fx.listing()[0])
+    return client.post(f'/listings/{listing_id}/unlike', headers=fx.auth(user_id))
+
+# (name, request factory, share of --requests). Login is bcrypt-bound, so it gets fewer.
+SCENARIOS = [
+    ('listings_browse', browse, 1.0),
+    ('listings_filtered', browse_filtered, 1.0),
+    ('listings_search', search, 1.0),
+    ('listing_detail', listing_detail, 1.0),
+    ('auth_token', login, 0.1),
+    ('send_message', send_message, 1.0),
+    ('conversations', conversations, 1.0),
+    ('like', like, 1.0),
+    ('unlike', unlike, 1.0),
+]
+
+
+async def run_scenario(client, fx, factory, requests: int, concurrency: int, warmup: int):
+    for _ in range(warmup):
+        await factory(client, fx)
+    samples = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await factory(client, fx)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput': len(samples) / elapsed,
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': statistics.median(samples),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+    }
+
+
+async def run(app, fx, args):
+    import httpx
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            for name, factory, share in SCENARIOS:
+                if args.scenarios and name not in args.scenarios:
+                    continue
+                requests = max(int(args.requests * share), args.concurrency)
+                results[name] = await run_scenario(client, fx, factory, requests, args.concurrency, args.warmup)
+                print_result(name, results[name])
+    return results
+
+
+def print_result(name, result):
+    print(
+        f"{name:<18} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+        f"{result['p99_ms']:>9.2f} {result['errors']:>7}"
+    )
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list:
+    """Print per-scenario deltas against a baseline run; returns the regressed scenarios"""
+    regressions = []
+    print(f"\n{'scenario':<18} {'req/s':>16} {'p95 ms':>18}")
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        rps_change = result['throughput'] / base['throughput'] - 1
+        p95_change = result['p95_ms'] / base['p95_ms'] - 1
+        regressed = rps_change < -threshold or p95_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<18} {result['throughput']:>8.1f} {rps_change:>+7.1%} "
+            f"{result['p95_ms']:>9.2f} {p95_change:>+7.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def prepare_database(args):
+    from sqlalchemy import select, func
+    from re_lease.database import engine
+    from re_lease.migrations import migrate
+    from re_lease.models.users import User
+    from re_lease.models.listings import Listing
+    from re_lease.synthetic_data import generate
+
+    migrate(engine)
+    with engine.connect() as conn:
+        populated = conn.execute(select(func.count(Listing.id))).scalar()
+    if not populated:
+        generate(
+            engine, users=args.users, listings=args.listings, likes_per_user=args.likes_per_user,
+            messages=args.messages, seed=args.seed
+        )
+    with engine.connect() as conn:
+        users = [tuple(row) for row in conn.execute(
+            select(User.id, User.username).where(User.username.like('user%')).order_by(User.id)
+        )]
+        listings = [tuple(row) for row in conn.execute(
+            select(Listing.id, Listing.user_id).order_by(Listing.id)
+        )]
+    return engine, users, listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="default: a throwaway SQLite file")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--listings", type=int, default=50_000)
+    parser.add_argument("--likes-per-user", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=[name for name, _, _ in SCENARIOS])
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ.setdefault('AUTH_SECRET_KEY', 'benchmark-secret')
+    os.environ.setdefault('AUTH_ALGORITHM', 'HS256')
+    os.environ.setdefault('EMAIL_SENDER_ENABLED', 'false')
+
+    engine, users, listings = prepare_database(args)
+    if len(users) < 2 or not listings:
+        sys.exit("database has no synthetic users/listings to benchmark against")
+
+    from re_lease.main import app
+    from re_lease.synthetic_data import SYNTHETIC_PASSWORD
+
+    fx = Fixture(users, listings, SYNTHETIC_PASSWORD, args.seed)
+    print(f"{engine.dialect.name}: {len(users)} users, {len(listings)} listings, concurrency {args.concurrency}")
+    print(f"{'scenario':<18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    results = asyncio.run(run(app, fx, args))
+
+    report = {
+        'meta': {
+            'dialect': engine.dialect.name,
+            'users': len(users),
+            'listings': len(listings),
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"regressed beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Time move-in/move-out window searches on generated listings.
+
+Usage: python benchmarks/availability.py [--rows 100000 1000000] [--repeat 20]
+
+Builds a throwaway SQLite database per row count with the synthetic data
+generator (listings posted over 2024, each available within two months of
+posting) and times get_listings for stays around the generator's "now" of
+2025-01-01, newest first and cheapest first.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+from re_lease.migrations import migrate
+from re_lease.models.listings import Listing
+from re_lease.synthetic_data import generate
+from re_lease.services.availability import apply_availability_filter
+from re_lease.services.listings import get_listings
+
+WINDOWS = [
+    ("next week", date(2025, 1, 5), date(2025, 1, 12)),
+    ("summer", date(2025, 6, 1), date(2025, 8, 15)),
+    ("fall semester", date(2025, 9, 1), date(2025, 12, 20)),
+    ("move in from March", date(2025, 3, 1), None),
+    # Already over: only the oldest listings match, at the far end of newest-first
+    ("last February", date(2024, 2, 1), date(2024, 2, 7)),
+]
+SORTS = ["newest", "price_asc"]
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            migrate(engine)
+            generate(engine, users=max(rows // 50, 2), listings=rows, seed=1)
+            with Session(engine) as db:
+                for name, move_in, move_out in WINDOWS:
+                    matches = apply_availability_filter(
+                        db.query(func.count(Listing.id)).filter(Listing.status == 'active'),
+                        engine.dialect.name, move_in, move_out
+                    ).scalar()
+                    for sort in SORTS:
+                        p50, p95 = timed(
+                            lambda: get_listings(db, limit=20, move_in=move_in, move_out=move_out, sort=sort),
+                            args.repeat
+                        )
+                        results.append(f"{rows:>9} {name:<20} {sort:<10} {matches:>9} {p50:>9.2f} {p95:>9.2f}")
+            engine.dispose()
+
+    print(f"{'rows':>9} {'stay':<20} {'sort':<10} {'matches':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    print("\n".join(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Latency of fast requests while slow requests are in flight.
+
+Usage: python benchmarks/concurrency.py [--rows 100000] [--slow 4] [--fast 200]
+
+Runs the app in-process over ASGI against a throwaway SQLite database.
+`--slow` concurrent clients keep issuing uncached relevance-ranked searches
+(~100ms each) while one client times cheap requests. If handlers block the
+event loop, the fast requests queue behind the slow ones and p99 explodes.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import timedelta
+
+warnings.filterwarnings("ignore")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(app, token: str, slow_clients: int, fast_requests: int):
+    import httpx
+
+    headers = {'Authorization': f'Bearer {token}'}
+    transport = httpx.ASGITransport(app=app)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def slow(worker: int):
+            page = 0
+            while not done.is_set():
+                await client.get('/listings/', params={'search': 'apartment', 'skip': worker * 100000 + page})
+                page += 1
+
+        async def fast():
+            samples = []
+            for _ in range(fast_requests):
+                start = time.perf_counter()
+                await client.get('/listings/1', headers=headers)
+                samples.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.005)
+            done.set()
+            return samples
+
+        slow_tasks = [asyncio.create_task(slow(i)) for i in range(slow_clients)]
+        samples = await fast()
+        await asyncio.gather(*slow_tasks)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--slow", type=int, default=4)
+    parser.add_argument("--fast", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.db")
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+    os.environ.setdefault('AUTH_SECRET_KEY', 'benchmark-secret')
+    os.environ.setdefault('AUTH_ALGORITHM', 'HS256')
+
+    from search import build
+    build(path, args.rows).dispose()
+
+    from re_lease.main import app
+    from re_lease.services.users import create_access_token
+
+    token = create_access_token('bench', 1, timedelta(minutes=20))
+    samples = asyncio.run(run(app, token, args.slow, args.fast))
+    print(f"fast GET /listings/{{id}} with {args.slow} slow searches in flight ({len(samples)} samples)")
+    print(f"  p50 {statistics.median(samples):8.2f} ms")
+    print(f"  p95 {percentile(samples, 95):8.2f} ms")
+    print(f"  p99 {percentile(samples, 99):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
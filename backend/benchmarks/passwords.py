@@ -0,0 +1,45 @@
+"""Password verification throughput of the bcrypt worker pool.
+
+Usage: python benchmarks/passwords.py [--workers 1 2 4] [--logins 64] [--rounds 12]
+
+Verifies `--logins` passwords concurrently through re_lease.passwords at each
+pool size and reports logins/second overall and per worker process.
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+warnings.filterwarnings("ignore")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+
+    from re_lease.passwords import PasswordHasher, bcrypt_context
+
+    password_hash = bcrypt_context.hash('password123')
+    print(f"bcrypt cost {args.rounds}, {args.logins} concurrent logins")
+    print(f"{'workers':>8} {'logins/s':>10} {'per worker':>11}")
+    for workers in args.workers:
+        hasher = PasswordHasher(workers, max_pending=args.logins)
+        hasher.verify_and_update('password123', password_hash)  # start the pool
+        with ThreadPoolExecutor(args.logins) as clients:
+            start = time.perf_counter()
+            list(clients.map(lambda _: hasher.verify_and_update('password123', password_hash), range(args.logins)))
+            elapsed = time.perf_counter() - start
+        hasher.shutdown()
+        rate = args.logins / elapsed
+        print(f"{workers:>8} {rate:>10.1f} {rate / workers:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare listing search latency: FTS index vs the old ilike scan.
+
+Usage: python benchmarks/search.py [--rows 100000 1000000] [--repeat 20]
+
+Builds a throwaway SQLite database per row count, fills it with synthetic
+listings and times the same searches through both paths.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from re_lease.database import Base
+from re_lease.models.users import User
+from re_lease.models.listings import Listing
+from re_lease.services.search import apply_ilike_search, install_search_index
+from re_lease.services.listings import get_listings
+
+WORDS = (
+    "apartment studio loft house room shared private sunny quiet spacious cozy modern "
+    "renovated furnished parking laundry balcony garden pool gym campus downtown "
+    "northside southside eastside westside library bus station park view kitchen "
+    "hardwood carpet pets allowed utilities included walk bike summer fall spring"
+).split()
+LOCATIONS = ["Downtown", "Northside", "Southside", "Eastside", "Westside", "Campus Village"]
+AVAILABLE_FROM = datetime(2026, 6, 1)
+QUERIES = ["apartment", "quiet garden", "renov", "pets allowed downtown", "zzzz"]
+
+
+def vocabulary(rnd: random.Random, size: int = 5000):
+    """Listing words plus filler tokens, with Zipf-like weights"""
+    words = WORDS + [f"w{i:04d}" for i in range(size - len(WORDS))]
+    rnd.shuffle(words)
+    return words, [1 / (rank + 1) for rank in range(len(words))]
+
+
+def build(path: str, rows: int, seed: int = 42):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rnd = random.Random(seed)
+    words, weights = vocabulary(rnd)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"username": "bench", "email": "bench@gmail.com", "password_hash": "x"}])
+        batch = []
+        for _ in range(rows):
+            batch.append({
+                "title": " ".join(rnd.choices(words, weights, k=4)),
+                "description": " ".join(rnd.choices(words, weights, k=40)),
+                "price": rnd.randint(300, 3000),
+                "location": rnd.choice(LOCATIONS),
+                "bedrooms": rnd.randint(1, 5),
+                "bathrooms": 1,
+                "available_from": AVAILABLE_FROM,
+                "status": "active",
+                "views": 0,
+                "interested": 0,
+                "user_id": 1,
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(Listing), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Listing), batch)
+    install_search_index(engine)
+    return engine
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'query':<24} {'ilike ms':>10} {'fts ms':>10}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = build(os.path.join(tmp, "bench.db"), rows)
+            with Session(engine) as db:
+                for q in QUERIES:
+                    def ilike():
+                        base = db.query(Listing).filter(Listing.status == 'active')
+                        apply_ilike_search(base, q).limit(100).all()
+
+                    ilike_ms = timed(ilike, args.repeat)
+                    fts_ms = timed(lambda: get_listings(db, search=q, limit=100), args.repeat)
+                    print(f"{rows:>9} {q:<24} {ilike_ms:>10.2f} {fts_ms:>10.2f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
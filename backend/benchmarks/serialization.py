@@ -0,0 +1,102 @@
+"""Listing rows serialized per second: validated pydantic models vs listing_dict + orjson.
+
+Usage: python benchmarks/serialization.py [--rows 100 1000 10000] [--repeat 20]
+
+Loads `--rows` synthetic listings (with their owners) from a throwaway
+SQLite database and times turning them into a JSON list body: "pydantic"
+is the previous path (json.loads per column, a validated ListingResponse
+per row, TypeAdapter.dump_json), "direct" is re_lease.serialization.
+Both must produce identical bytes. Database time is not included.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+from typing import List
+
+warnings.filterwarnings("ignore")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, joinedload
+
+from re_lease.migrations import migrate
+from re_lease.models.listings import Listing
+from re_lease.schemas.listings import ListingResponse
+from re_lease.serialization import encode_json, listing_dict
+from re_lease.synthetic_data import generate
+
+listings_adapter = TypeAdapter(List[ListingResponse])
+
+
+def validated(listings) -> bytes:
+    return listings_adapter.dump_json([
+        ListingResponse(
+            id=listing.id,
+            title=listing.title,
+            description=listing.description,
+            price=listing.price,
+            location=listing.location,
+            latitude=listing.latitude,
+            longitude=listing.longitude,
+            bedrooms=listing.bedrooms,
+            bathrooms=listing.bathrooms,
+            available_from=listing.available_from,
+            available_to=listing.available_to,
+            amenities=json.loads(listing.amenities) if listing.amenities else [],
+            images=json.loads(listing.images) if listing.images else [],
+            status=listing.status,
+            views=listing.views,
+            interested=listing.interested,
+            created_at=listing.created_at,
+            updated_at=listing.updated_at,
+            user_id=listing.user_id,
+            user_username=listing.user.username,
+            like_count=listing.like_count
+        )
+        for listing in listings
+    ])
+
+
+def direct(listings) -> bytes:
+    return encode_json([listing_dict(listing, listing.user.username) for listing in listings])
+
+
+def rate(render, listings, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(listings)
+        best = min(best, time.perf_counter() - start)
+    return len(listings) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        migrate(engine)
+        generate(engine, users=max(max(args.rows) // 50, 2), listings=max(args.rows), seed=1)
+        with Session(engine) as db:
+            all_listings = db.scalars(select(Listing).options(joinedload(Listing.user)).order_by(Listing.id)).all()
+
+            print(f"{'rows':>8} {'pydantic rows/s':>16} {'direct rows/s':>14} {'speedup':>8}")
+            for rows in args.rows:
+                listings = all_listings[:rows]
+                if validated(listings) != direct(listings):
+                    sys.exit(f"output differs at {rows} rows")
+                before, after = rate(validated, listings, args.repeat), rate(direct, listings, args.repeat)
+                print(f"{rows:>8} {before:>16,.0f} {after:>14,.0f} {after / before:>7.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+class Generation:
+    """Counter bumped on every write to a table; cache keys include it so
+    entries built before a write are never served after it.
+
+    Generations are per process: other workers pick up the change when
+    their own entries expire.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+
+# Serialized GET /listings/ pages keyed by (generation, normalized filters)
+listings_generation = Generation()
+listing_page_cache = TTLCache(
+    maxsize=int(os.getenv('LISTING_CACHE_SIZE', '512')),
+    ttl=float(os.getenv('LISTING_CACHE_TTL', '30'))
+)
+
+# deps.Principal objects keyed by user id, see deps.get_current_user
+principal_generation = Generation()
+principal_cache = TTLCache(
+    maxsize=int(os.getenv('PRINCIPAL_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('PRINCIPAL_CACHE_TTL', '30'))
+)
@@ -1,7 +1,12 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 
 
@@ -10,10 +15,128 @@ DATABASE_URL = os.getenv(
     "sqlite:///./Re-lease.db"
 )
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# Named engine configurations, selected with DB_PROFILE (defaults to the
+# dev or postgres profile matching DATABASE_URL). sqlite_pragmas are
+# applied to every new SQLite connection.
+ENGINE_PROFILES = {
+    'dev-sqlite': {
+        'pool': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30, 'pool_pre_ping': False, 'pool_recycle': -1},
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 64 * 1024 * 1024,
+        },
+    },
+    'prod-sqlite': {
+        'pool': {'pool_size': 8, 'max_overflow': 8, 'pool_timeout': 10, 'pool_pre_ping': False, 'pool_recycle': -1},
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 10000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64000,
+            'temp_store': 'MEMORY',
+        },
+    },
+    'prod-postgres': {
+        'pool': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 10, 'pool_pre_ping': True, 'pool_recycle': 1800},
+        'sqlite_pragmas': {},
+    },
+}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout counts, wait time and timeouts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        # Includes the connect time when the pool has to open a new connection
+        waited = time.perf_counter() - start
+        with self.stats_lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return connection
+
+    def recreate(self):
+        # Keep the counters across pool recreation (e.g. after engine.dispose())
+        new_pool = super().recreate()
+        new_pool.checkouts = self.checkouts
+        new_pool.timeouts = self.timeouts
+        new_pool.wait_seconds_total = self.wait_seconds_total
+        new_pool.wait_seconds_max = self.wait_seconds_max
+        return new_pool
+
+def default_profile(url: str) -> str:
+    return 'dev-sqlite' if url.startswith("sqlite") else 'prod-postgres'
+
+def build_engine(url: str, profile_name: str):
+    """Create an engine configured from one of ENGINE_PROFILES"""
+    profile = ENGINE_PROFILES[profile_name]
+    is_sqlite = url.startswith("sqlite")
+    in_memory = is_sqlite and make_url(url).database in (None, "", ":memory:")
+
+    kwargs = {}
+    if is_sqlite:
+        kwargs['connect_args'] = {"check_same_thread": False}
+    if not in_memory:
+        pool = dict(profile['pool'])
+        pool['pool_size'] = int(os.getenv('DB_POOL_SIZE', pool['pool_size']))
+        pool['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', pool['max_overflow']))
+        kwargs.update(pool, poolclass=InstrumentedQueuePool)
+
+    new_engine = create_engine(url, **kwargs)
+
+    pragmas = profile['sqlite_pragmas'] if is_sqlite and not in_memory else {}
+    if pragmas:
+        @event.listens_for(new_engine, "connect")
+        def apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return new_engine
+
+DB_PROFILE = os.getenv("DB_PROFILE", default_profile(DATABASE_URL))
+
+engine = build_engine(DATABASE_URL, DB_PROFILE)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+def pool_stats() -> dict:
+    """Connection pool telemetry for sizing workers"""
+    pool = engine.pool
+    stats = {'profile': DB_PROFILE, 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool.stats_lock:
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_seconds_total=pool.wait_seconds_total,
+                wait_seconds_max=pool.wait_seconds_max,
+                wait_seconds_avg=pool.wait_seconds_total / pool.checkouts if pool.checkouts else 0.0,
+            )
+    return stats
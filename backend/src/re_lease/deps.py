@@ -1,13 +1,15 @@
-from typing import Annotated
+from dataclasses import dataclass
+from typing import Annotated, Optional
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 import os
 from .database import SessionLocal
 from .models.users import User
+from .passwords import bcrypt_context
+from .cache import principal_cache, principal_generation
 
 load_dotenv()
 
@@ -23,22 +25,77 @@ def get_db():
 
 db_dependency = Annotated[Session, Depends(get_db)]
 
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token')
 oauth2_bearer_dependency = Annotated[str, Depends(oauth2_bearer)]
+optional_bearer = OAuth2PasswordBearer(tokenUrl='auth/token', auto_error=False)
 
-async def get_current_user(token: oauth2_bearer_dependency, db: Session = Depends(get_db)):
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user, detached from any session and safe to cache"""
+    id: int
+    username: str
+    email: str
+    verified: bool
+    bio: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> 'Principal':
+        return cls(id=user.id, username=user.username, email=user.email, verified=bool(user.verified), bio=user.bio)
+
+def invalidate_principal(user_id: int):
+    """Drop a user's cached principal; call after committing changes to their row"""
+    principal_generation.bump()
+    principal_cache.invalidate(user_id)
+
+def principal_from_token(token: str, db: Session) -> Principal:
+    """Resolve a bearer token to its user; raises 401 if it is invalid"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get('sub')
         user_id: int = payload.get('id')
         if username is None or user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user')
+        principal = principal_cache.get(user_id)
+        if principal is not None:
+            return principal
+        # Don't cache a row read while an invalidation happened
+        generation = principal_generation.value
         user = db.query(User).filter(User.id == user_id).first()
         if user is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found')
-        return user
+        principal = Principal.from_user(user)
+        if principal_generation.value == generation:
+            principal_cache.set(user_id, principal)
+        return principal
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user')
 
-user_dependency = Annotated[User, Depends(get_current_user)]
\ No newline at end of file
+def get_current_user(token: oauth2_bearer_dependency, db: Session = Depends(get_db)) -> Principal:
+    return principal_from_token(token, db)
+
+def get_optional_user(token: Optional[str] = Depends(optional_bearer), db: Session = Depends(get_db)) -> Optional[Principal]:
+    """The signed-in user on endpoints that also serve anonymous visitors.
+
+    An expired or invalid token is served as anonymous rather than rejected.
+    """
+    if token is None:
+        return None
+    try:
+        return principal_from_token(token, db)
+    except HTTPException:
+        return None
+
+def authenticate_websocket(token: Optional[str]) -> Optional[Principal]:
+    """The user a WebSocket token belongs to, or None. Reads the database only on a cache miss"""
+    if not token:
+        return None
+    db = SessionLocal()
+    try:
+        return principal_from_token(token, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+user_dependency = Annotated[Principal, Depends(get_current_user)]
+optional_user_dependency = Annotated[Optional[Principal], Depends(get_optional_user)]
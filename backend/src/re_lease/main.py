@@ -1,37 +1,127 @@
+import asyncio
+import logging
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth
 from .routers import users
 from .routers import listings
-from .models import users as user_models
-from .models import listings as listing_models
 from .seed_data import seed_database
+from .migrations import migrate, is_migrated
+from .services.counters import listing_counters
+from .cache import listing_page_cache, principal_cache
+from .passwords import password_hasher
+from .services.email import email_sender
+from .services.realtime import message_hub
+from .database import SessionLocal, engine, pool_stats
+from .metrics import CONTENT_TYPE_LATEST, InstrumentedAPIRoute, mark_process_dead, render_metrics, sample_runtime_metrics
+from .profiling import SQL_PROFILING, SQL_PROFILING_HEADERS, PROFILING_HEADERS, SQLProfilingMiddleware, install_sql_profiling
 
-from .database import Base, engine
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+def warmup():
+    """Open the pool's connections, start the bcrypt workers and build the first browse page"""
+    pool_size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+    connections = [engine.connect() for _ in range(pool_size)]
+    for connection in connections:
+        connection.close()
+    password_hasher.warmup()
+    db = SessionLocal()
+    try:
+        listings.warm_listing_cache(db)
+    finally:
+        db.close()
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Route handlers are sync and run in this pool; size it to the DB pool
+    threadpool_size = os.getenv('THREADPOOL_SIZE')
+    if threadpool_size:
+        to_thread.current_default_thread_limiter().total_tokens = int(threadpool_size)
+    # Schema changes normally run once per deploy via `python -m re_lease.cli migrate`
+    if os.getenv('AUTO_MIGRATE', 'false').lower() == 'true':
+        await to_thread.run_sync(migrate, engine)
+        await to_thread.run_sync(seed_database)
+    if os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true':
+        await to_thread.run_sync(warmup)
+    listing_counters.start()
+    email_sender_enabled = os.getenv('EMAIL_SENDER_ENABLED', 'true').lower() == 'true'
+    if email_sender_enabled:
+        email_sender.start()
+    if os.getenv('REALTIME_ENABLED', 'true').lower() == 'true':
+        message_hub.start()
+    metrics_sampler = asyncio.create_task(sample_runtime_metrics(email_queue=email_sender_enabled))
+    try:
+        yield
+    finally:
+        metrics_sampler.cancel()
+        mark_process_dead()
+        # Write buffered view/interest counts before the worker exits
+        listing_counters.stop()
+        email_sender.stop()
+        message_hub.stop()
+        password_hasher.shutdown()
 
-# Seed the database with sample data
-seed_database()
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = InstrumentedAPIRoute
 
 # Get allowed origins from environment variable or use defaults
 allowed_origins = os.getenv('ALLOWED_ORIGINS', 'https://moshandymanservices.org,http://localhost:3000').split(',')
 
+if SQL_PROFILING:
+    install_sql_profiling(engine)
+    app.add_middleware(SQLProfilingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=['X-Next-Cursor'] + (PROFILING_HEADERS if SQL_PROFILING_HEADERS else []),
 )
 
 @app.get("/")
 def health_check():
     return 'Health check complete'
 
+_schema_ready = False
+
+@app.get("/ready")
+def readiness_check(response: Response):
+    """Ready once the database answers and the schema has been migrated"""
+    global _schema_ready
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        if not _schema_ready:
+            _schema_ready = is_migrated(engine)
+    except Exception:
+        # The error can name the host, DSN or driver; keep it in the logs
+        logger.exception("Readiness check failed")
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {'status': 'unavailable', 'detail': 'database unavailable'}
+    if not _schema_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {'status': 'unavailable', 'detail': 'database schema is not migrated'}
+    return {'status': 'ready'}
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/stats/cache")
+def cache_stats():
+    return {'listing_pages': listing_page_cache.stats(), 'principals': principal_cache.stats()}
+
+@app.get("/stats/pool")
+def database_pool_stats():
+    return pool_stats()
+
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(listings.router)
@@ -0,0 +1,189 @@
+"""Prometheus metrics served at GET /metrics.
+
+Route metrics are recorded by InstrumentedAPIRoute, which every router
+uses as its route_class. Each route creates its labelled children once
+at startup, so a request only increments and observes them.
+
+Pool, cache, worker-queue and event-loop gauges are sampled every
+METRICS_SAMPLE_INTERVAL seconds by sample_runtime_metrics.
+
+To aggregate across uvicorn/gunicorn worker processes, point
+PROMETHEUS_MULTIPROC_DIR at an empty directory before the workers
+start. Each process then writes its samples there, and /metrics merges
+them.
+"""
+import asyncio
+import logging
+import os
+import time
+from anyio import to_thread
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    REGISTRY, CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from starlette.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+METRICS_SAMPLE_INTERVAL = float(os.getenv('METRICS_SAMPLE_INTERVAL', '1'))
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+
+http_requests = Counter(
+    're_lease_http_requests_total', 'HTTP requests handled, by route and status class',
+    ['method', 'route', 'status']
+)
+http_request_duration = Histogram(
+    're_lease_http_request_duration_seconds', 'Time spent in the route handler, including serialization',
+    ['method', 'route'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+http_requests_in_flight = Gauge(
+    're_lease_http_requests_in_flight', 'Requests currently being handled',
+    ['method', 'route'], multiprocess_mode='livesum'
+)
+
+event_loop_lag = Gauge(
+    're_lease_event_loop_lag_seconds', 'How late the metrics sampler woke up on the event loop',
+    multiprocess_mode='livemax'
+)
+db_pool_connections = Gauge(
+    're_lease_db_pool_connections', 'SQLAlchemy pool connections by state',
+    ['state'], multiprocess_mode='livesum'
+)
+db_pool_checkouts = Gauge(
+    're_lease_db_pool_checkouts', 'Connections checked out of the pool since start',
+    multiprocess_mode='livesum'
+)
+db_pool_timeouts = Gauge(
+    're_lease_db_pool_timeouts', 'Pool checkouts that timed out since start',
+    multiprocess_mode='livesum'
+)
+db_pool_wait_seconds = Gauge(
+    're_lease_db_pool_wait_seconds', 'Total time spent waiting for pool connections since start',
+    multiprocess_mode='livesum'
+)
+cache_entries = Gauge('re_lease_cache_entries', 'Entries held per cache', ['cache'], multiprocess_mode='livesum')
+cache_hits = Gauge('re_lease_cache_hits', 'Cache hits since start', ['cache'], multiprocess_mode='livesum')
+cache_misses = Gauge('re_lease_cache_misses', 'Cache misses since start', ['cache'], multiprocess_mode='livesum')
+password_hash_pending = Gauge(
+    're_lease_password_hash_pending', 'bcrypt jobs queued or running in the worker pool',
+    multiprocess_mode='livesum'
+)
+listing_counter_pending = Gauge(
+    're_lease_listing_counter_pending', 'Listings with buffered view/interest increments',
+    multiprocess_mode='livesum'
+)
+email_queue_pending = Gauge(
+    're_lease_email_queue_pending', 'Emails waiting in the outbound_emails queue',
+    multiprocess_mode='max'
+)
+realtime_connections = Gauge(
+    're_lease_realtime_connections', 'Open message WebSocket connections',
+    multiprocess_mode='livesum'
+)
+realtime_slow_disconnects = Gauge(
+    're_lease_realtime_slow_disconnects', 'WebSocket consumers disconnected for falling behind since start',
+    multiprocess_mode='livesum'
+)
+
+class InstrumentedAPIRoute(APIRoute):
+    """APIRoute that records request counts, latency and in-flight requests"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        method = next(iter(sorted(self.methods))) if self.methods else 'ANY'
+        requests = tuple(http_requests.labels(method, self.path, status) for status in STATUS_CLASSES)
+        duration = http_request_duration.labels(method, self.path)
+        in_flight = http_requests_in_flight.labels(method, self.path)
+
+        async def instrumented_handler(request):
+            in_flight.inc()
+            start = time.perf_counter()
+            status_code = 500
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+                return response
+            except HTTPException as e:
+                status_code = e.status_code
+                raise
+            except RequestValidationError:
+                # FastAPI's default handler answers these with 422
+                status_code = 422
+                raise
+            finally:
+                duration.observe(time.perf_counter() - start)
+                requests[min(max(status_code // 100, 1), 5) - 1].inc()
+                in_flight.dec()
+
+        return instrumented_handler
+
+def _sample_process_metrics():
+    from .cache import listing_page_cache, principal_cache
+    from .database import pool_stats
+    from .passwords import password_hasher
+    from .services.counters import listing_counters
+    from .services.realtime import message_hub
+
+    stats = pool_stats()
+    if 'size' in stats:
+        db_pool_connections.labels('checked_out').set(stats['checked_out'])
+        db_pool_connections.labels('checked_in').set(stats['checked_in'])
+        db_pool_connections.labels('overflow').set(stats['overflow'])
+    if 'checkouts' in stats:
+        db_pool_checkouts.set(stats['checkouts'])
+        db_pool_timeouts.set(stats['timeouts'])
+        db_pool_wait_seconds.set(stats['wait_seconds_total'])
+    for name, cache in (('listing_pages', listing_page_cache), ('principals', principal_cache)):
+        cache_stats = cache.stats()
+        cache_entries.labels(name).set(cache_stats['size'])
+        cache_hits.labels(name).set(cache_stats['hits'])
+        cache_misses.labels(name).set(cache_stats['misses'])
+    password_hash_pending.set(password_hasher.pending)
+    listing_counter_pending.set(listing_counters.pending_listings())
+    realtime_connections.set(message_hub.connections())
+    realtime_slow_disconnects.set(message_hub.disconnected_slow)
+
+def _sample_email_queue():
+    from .database import SessionLocal
+    from .services.email import count_pending_emails
+
+    db = SessionLocal()
+    try:
+        email_queue_pending.set(count_pending_emails(db))
+    finally:
+        db.close()
+
+async def sample_runtime_metrics(interval: float = METRICS_SAMPLE_INTERVAL, email_queue: bool = True):
+    """Periodically refresh the sampled gauges until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        # A blocked event loop wakes the sleep late by however long it was blocked
+        event_loop_lag.set(max(loop.time() - expected, 0.0))
+        try:
+            _sample_process_metrics()
+        except Exception:
+            logger.exception("Error sampling process metrics")
+        if email_queue:
+            try:
+                await to_thread.run_sync(_sample_email_queue)
+            except Exception:
+                logger.exception("Error sampling the email queue")
+
+def render_metrics() -> bytes:
+    """Metrics in the Prometheus text format, merged across processes in multiprocess mode"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the shared multiprocess directory"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
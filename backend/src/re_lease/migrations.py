@@ -0,0 +1,105 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from .database import Base
+from .models import users as user_models
+from .models import listings as listing_models
+from .models import emails as email_models
+from .models import places as place_models
+from .services.search import install_search_index
+from .services.geo import install_geo_index, seed_places, backfill_listing_coordinates
+from .services.availability import install_availability_index
+from .services.amenities import backfill_listing_amenities
+from .services.likes import backfill_like_counts
+from .services.listings import backfill_conversations
+
+# Data backfills, each run once by the migration that creates its target: a
+# new table, or a "table.column" added to an existing one. Those with a
+# source only run if the source table already existed.
+DATA_MIGRATIONS = [
+    ('listing_amenities', 'listings', backfill_listing_amenities),
+    ('places', None, seed_places),
+    ('listings.latitude', 'listings', backfill_listing_coordinates),
+    ('listings.like_count', 'liked_listings', backfill_like_counts),
+    ('conversations', 'messages', backfill_conversations),
+]
+
+# Indexes superseded by newer ones, dropped wherever they still exist
+RETIRED_INDEXES = [
+    'ix_listings_status_id',
+    'ix_listings_status_price_id',
+]
+
+def _add_missing_columns(conn) -> list:
+    """ALTER existing tables to add columns declared on the models since they were created"""
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def _add_missing_indexes(conn) -> list:
+    """Create indexes declared on the models that existing tables do not have yet"""
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                added.append(index.name)
+    return added
+
+def _drop_retired_indexes(conn) -> list:
+    """Drop indexes listed in RETIRED_INDEXES that are still present"""
+    inspector = inspect(conn)
+    existing = {
+        index['name']
+        for table in inspector.get_table_names()
+        for index in inspector.get_indexes(table)
+    }
+    dropped = []
+    for name in RETIRED_INDEXES:
+        if name in existing:
+            conn.execute(text(f"DROP INDEX {name}"))
+            dropped.append(f"{name} (dropped)")
+    return dropped
+
+def _run_data_migrations(conn, tables_before: set, created: set) -> list:
+    applied = []
+    for target, source, backfill in DATA_MIGRATIONS:
+        if target not in created or (source is not None and source not in tables_before):
+            continue
+        rows = backfill(conn)
+        applied.append(f"{target} ({rows} rows backfilled from {source})" if source else f"{target} ({rows} rows seeded)")
+    return applied
+
+def migrate(engine: Engine) -> list:
+    """Bring the database schema up to date with the models. Safe to re-run"""
+    with engine.connect() as conn:
+        tables_before = set(inspect(conn).get_table_names())
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        changes = _add_missing_columns(conn)
+        changes += _add_missing_indexes(conn)
+        changes += _drop_retired_indexes(conn)
+        created = set(Base.metadata.tables) - tables_before
+        changes += _run_data_migrations(conn, tables_before, created | set(changes))
+    install_search_index(engine)
+    install_geo_index(engine)
+    install_availability_index(engine)
+    return changes
+
+def is_migrated(engine: Engine) -> bool:
+    """True when every model table exists"""
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        return all(inspector.has_table(table.name) for table in Base.metadata.sorted_tables)
@@ -1,2 +1,4 @@
 from .users import User, Base
-from .listings import Listing, Message 
\ No newline at end of file
+from .listings import Listing, Message, Conversation, Amenity
+from .emails import OutboundEmail
+from .places import Place
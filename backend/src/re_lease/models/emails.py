@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.sql import func
+from ..database import Base
+
+class OutboundEmail(Base):
+    """Queued email, delivered by the background sender in services.email"""
+    __tablename__ = 'outbound_emails'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_address = Column(String(100), nullable=False)
+    subject = Column(String(200), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # Earliest time the next delivery attempt may start; while a sender
+    # holds the row it is pushed out by the claim lease
+    next_attempt_at = Column(DateTime, nullable=False)
+    claimed_by = Column(String(64), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_outbound_emails_status_next_attempt', 'status', 'next_attempt_at'),
+    )
@@ -1,15 +1,39 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Table
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Table, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from ..database import Base
 
+# Predicate of the partial listing indexes: browsing only ever reads active
+# listings. Queries must render it inline (see services.listings.ACTIVE), as
+# SQLite cannot match a partial index against a bound parameter.
+ACTIVE_LISTINGS = text("status = 'active'")
+
 liked_listings = Table(
     'liked_listings',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('listing_id', Integer, ForeignKey('listings.id'), primary_key=True)
+    Column('listing_id', Integer, ForeignKey('listings.id'), primary_key=True),
+    # Who liked a listing; the primary key only serves the reverse
+    Index('ix_liked_listings_listing', 'listing_id')
 )
 
+listing_amenities = Table(
+    'listing_amenities',
+    Base.metadata,
+    Column('listing_id', Integer, ForeignKey('listings.id'), primary_key=True),
+    Column('amenity_id', Integer, ForeignKey('amenities.id'), primary_key=True),
+    # Amenity filters look up listings by amenity
+    Index('ix_listing_amenities_amenity_listing', 'amenity_id', 'listing_id')
+)
+
+class Amenity(Base):
+    __tablename__ = 'amenities'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50), unique=True, nullable=False)
+
+    listings = relationship("Listing", secondary=listing_amenities, back_populates="amenity_set")
+
 class Listing(Base):
     __tablename__ = 'listings'
 
@@ -18,14 +42,20 @@ class Listing(Base):
     description = Column(Text, nullable=False)
     price = Column(Float, nullable=False)
     location = Column(String(200), nullable=False)
+    # Geocoded from location via the places table unless given explicitly
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
     bedrooms = Column(Integer, nullable=False)
     bathrooms = Column(Float, nullable=False)
     available_from = Column(DateTime, nullable=False)
-    amenities = Column(Text, nullable=True)  # JSON string of amenities
+    available_to = Column(DateTime, nullable=True)  # None: open-ended
+    amenities = Column(Text, nullable=True)  # JSON string of amenities, a display copy of amenity_set
     images = Column(Text, nullable=True)  # JSON string of image URLs
     status = Column(String(20), default='active')  # active, pending, rented
     views = Column(Integer, default=0)
     interested = Column(Integer, default=0)
+    # Rows in liked_listings for this listing, kept in step by services.likes
+    like_count = Column(Integer, nullable=False, default=0, server_default='0')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -38,6 +68,23 @@ class Listing(Base):
 
     liked_by = relationship("User", secondary=liked_listings, back_populates="liked_listings")
 
+    # Normalized amenities, used for filtering
+    amenity_set = relationship("Amenity", secondary=listing_amenities, back_populates="listings")
+
+    __table_args__ = (
+        # Keyset pagination for the browse sorts in services.listings.get_listings,
+        # and the equality filters that browsing combines with newest first
+        Index('ix_listings_active_id', 'id', sqlite_where=ACTIVE_LISTINGS, postgresql_where=ACTIVE_LISTINGS),
+        Index('ix_listings_active_price_id', 'price', 'id',
+              sqlite_where=ACTIVE_LISTINGS, postgresql_where=ACTIVE_LISTINGS),
+        Index('ix_listings_active_bedrooms_id', 'bedrooms', 'id',
+              sqlite_where=ACTIVE_LISTINGS, postgresql_where=ACTIVE_LISTINGS),
+        Index('ix_listings_active_location_id', 'location', 'id',
+              sqlite_where=ACTIVE_LISTINGS, postgresql_where=ACTIVE_LISTINGS),
+        # A user's own listings, newest first
+        Index('ix_listings_user_created', 'user_id', 'created_at'),
+    )
+
 class Message(Base):
     __tablename__ = 'messages'
 
@@ -52,4 +99,40 @@ class Message(Base):
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
-    listing = relationship("Listing", back_populates="messages") 
\ No newline at end of file
+    listing = relationship("Listing", back_populates="messages")
+
+    __table_args__ = (
+        # One thread in one direction: history pages walk it by id from
+        # both directions, marking it read seeks the unread tail of one
+        Index('ix_messages_thread_id', 'sender_id', 'receiver_id', 'listing_id', 'id'),
+        Index('ix_messages_thread_unread', 'sender_id', 'receiver_id', 'listing_id', 'is_read'),
+    )
+
+class Conversation(Base):
+    """Inbox entry for one thread: a pair of users talking about a listing.
+
+    Maintained by create_message and mark_messages_as_read so the inbox can
+    be read without scanning messages. The pair is stored ordered
+    (user_low_id < user_high_id) with one unread counter per participant.
+    """
+    __tablename__ = 'conversations'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_low_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_high_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    listing_id = Column(Integer, ForeignKey('listings.id'), nullable=False)
+
+    # Snapshot of the newest message in the thread
+    last_message_id = Column(Integer, ForeignKey('messages.id'), nullable=True)
+    last_message_text = Column(Text, nullable=True)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Unread messages addressed to user_low_id / user_high_id
+    unread_low = Column(Integer, nullable=False, default=0)
+    unread_high = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('user_low_id', 'user_high_id', 'listing_id', name='uq_conversations_users_listing'),
+        Index('ix_conversations_low_last', 'user_low_id', 'last_message_at'),
+        Index('ix_conversations_high_last', 'user_high_id', 'last_message_at'),
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, Float
+from ..database import Base
+
+class Place(Base):
+    """Local gazetteer used to geocode listing locations without a network call"""
+    __tablename__ = 'places'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(200), unique=True, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+load_dotenv()
+
+# Changing BCRYPT_ROUNDS makes existing hashes "need update"; they are
+# transparently re-hashed at the new cost on the user's next login.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', str(PASSWORD_HASH_WORKERS * 4)))
+
+bcrypt_context = CryptContext(
+    schemes=['bcrypt'],
+    deprecated='auto',
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+def _hash(password: str) -> str:
+    return bcrypt_context.hash(password)
+
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return bcrypt_context.verify_and_update(password, password_hash)
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool so hashing never holds the GIL
+    of the API process.
+
+    At most `max_pending` jobs may be queued or running; beyond that callers
+    get a 503 instead of piling up. With `workers=0` hashing runs inline.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def pending(self) -> int:
+        """Jobs currently queued or running"""
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a threaded server process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in attempts in progress, please retry shortly",
+                headers={'Retry-After': '1'}
+            )
+        with self._lock:
+            self._pending += 1
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Check a password; also returns a new hash when the stored one uses outdated settings"""
+        return self._run(_verify_and_update, password, password_hash)
+
+    def warmup(self):
+        """Start the worker processes ahead of the first login"""
+        if self.workers:
+            executor = self._get_executor()
+            list(executor.map(_hash, ['warmup'] * self.workers))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
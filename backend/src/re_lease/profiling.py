@@ -0,0 +1,156 @@
+"""Opt-in SQL profiling: per-request statement stats and a slow-query log.
+
+Enabled with SQL_PROFILING=true. Every statement is timed through the
+engine's cursor events. Those that take longer than SLOW_QUERY_MS are
+logged as one JSON line to the `re_lease.sql.slow` logger, with a
+normalized fingerprint and the application frame that issued them. With
+SQL_PROFILING_HEADERS=true each response also carries X-DB-Statements,
+X-DB-Time-Ms and X-DB-Slowest.
+"""
+import hashlib
+import heapq
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_PROFILING = os.getenv('SQL_PROFILING', 'false').lower() == 'true'
+SQL_PROFILING_HEADERS = os.getenv('SQL_PROFILING_HEADERS', 'false').lower() == 'true'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+
+PROFILING_HEADERS = ['X-DB-Statements', 'X-DB-Time-Ms', 'X-DB-Slowest']
+
+slow_query_log = logging.getLogger('re_lease.sql.slow')
+request_log = logging.getLogger('re_lease.sql.requests')
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)"
+_IN_LIST_RE = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """Replace literals and placeholder lists so equivalent statements compare equal"""
+    normalized = _STRING_RE.sub('?', statement)
+    normalized = _NUMBER_RE.sub('?', normalized)
+    normalized = _IN_LIST_RE.sub('(...)', normalized)
+    return _WHITESPACE_RE.sub(' ', normalized).strip()
+
+def fingerprint(statement: str) -> Tuple[str, str]:
+    """(short hash, normalized SQL) identifying a statement's shape"""
+    normalized = normalize_sql(statement)
+    return hashlib.blake2b(normalized.encode(), digest_size=6).hexdigest(), normalized
+
+def _call_site() -> Optional[str]:
+    """The innermost application frame outside this module, e.g. services/listings.py:120 in get_listings"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PACKAGE_DIR) and filename != __file__:
+            return f"{os.path.relpath(filename, _PACKAGE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+class RequestProfile:
+    """SQL executed on behalf of one request"""
+
+    def __init__(self, path: str, keep: int = 3):
+        self.path = path
+        self.keep = keep
+        self.statements = 0
+        self.seconds = 0.0
+        self._slowest: List[Tuple[float, str]] = []
+
+    def record(self, seconds: float, statement: str):
+        self.statements += 1
+        self.seconds += seconds
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, (seconds, statement))
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, statement))
+
+    @property
+    def slowest(self) -> List[Tuple[float, str]]:
+        return sorted(self._slowest, reverse=True)
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        headers = [
+            (b'x-db-statements', str(self.statements).encode()),
+            (b'x-db-time-ms', f"{self.seconds * 1000:.2f}".encode()),
+        ]
+        if self._slowest:
+            seconds, statement = self.slowest[0]
+            headers.append((b'x-db-slowest', f"{seconds * 1000:.2f}ms {fingerprint(statement)[0]}".encode()))
+        return headers
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar('current_profile', default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_start'].pop()
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(seconds, statement)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        query_id, normalized = fingerprint(statement)
+        slow_query_log.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(seconds * 1000, 2),
+            'fingerprint': query_id,
+            'sql': normalized,
+            'call_site': _call_site(),
+            'path': profile.path if profile is not None else None,
+            'executemany': executemany,
+        }))
+
+def install_sql_profiling(engine: Engine):
+    """Time every statement the engine runs"""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+class SQLProfilingMiddleware:
+    """ASGI middleware that collects a RequestProfile for each HTTP request"""
+
+    def __init__(self, app, headers: bool = SQL_PROFILING_HEADERS):
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope['path'])
+        token = current_profile.set(profile)
+
+        async def send_with_headers(message):
+            if self.headers and message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + profile.headers()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_profile.reset(token)
+            if request_log.isEnabledFor(logging.DEBUG):
+                request_log.debug(json.dumps({
+                    'event': 'request_sql',
+                    'method': scope['method'],
+                    'path': profile.path,
+                    'statements': profile.statements,
+                    'db_ms': round(profile.seconds * 1000, 2),
+                    'slowest': [
+                        {'ms': round(seconds * 1000, 2), 'fingerprint': fingerprint(statement)[0]}
+                        for seconds, statement in profile.slowest
+                    ],
+                }))
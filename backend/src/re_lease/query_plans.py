@@ -0,0 +1,192 @@
+"""Query-plan checks for the hot service queries.
+
+Runs each query in HOT_QUERIES against the configured database, asks the
+planner how it executed every statement the query issued, and fails if
+one of them reads a whole table in WATCHED_TABLES. Meant for a seeded or
+generated database (`python -m re_lease.cli generate ...`): on a nearly
+empty one the planner may rightly prefer a scan. Everything runs inside a
+transaction that is rolled back, so write queries leave no trace.
+
+    python -m re_lease.cli check-plans
+"""
+import json
+import re
+from datetime import date, timedelta
+from typing import Callable, List, NamedTuple, Tuple
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from .models.listings import Listing, Message, liked_listings
+from .models.users import User
+from .services import listings as listing_service
+from .services.email import count_pending_emails
+from .services.geo import DEFAULT_PLACES
+from .services import likes
+
+# Tables large enough that a full scan on a request path is a regression
+WATCHED_TABLES = {
+    'users', 'listings', 'messages', 'conversations', 'liked_listings',
+    'listing_amenities', 'outbound_emails',
+}
+
+# EXPLAIN QUERY PLAN detail of a full table scan: "SCAN listings", or the
+# alias SQLAlchemy gave the table ("SCAN users_1"). "SCAN x USING INDEX"
+# walks an index and is fine.
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# A LIMITed statement that needs no sort step reads rows in the requested
+# order and stops after the page, e.g. newest first walking the rowid
+# backwards. Only a scan that must read everything is flagged.
+SQLITE_SORT_STEP = 'USE TEMP B-TREE FOR ORDER BY'
+LIMIT_CLAUSE = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+class Sample(NamedTuple):
+    """Existing rows the checks query for"""
+    listing_id: int
+    location: str
+    owner_id: int
+    liker_id: int
+    sender_id: int
+    receiver_id: int
+    thread_listing_id: int
+    message_id: int
+    username: str
+
+def pick_sample(db: Session) -> Sample:
+    """Pick ids from the database so every query hits real rows"""
+    listing = db.query(Listing.id, Listing.location, Listing.user_id).order_by(Listing.id.desc()).first()
+    liker_id = db.execute(select(liked_listings.c.user_id).limit(1)).scalar()
+    message = db.query(
+        Message.sender_id, Message.receiver_id, Message.listing_id, Message.id
+    ).order_by(Message.id.desc()).first()
+    username = db.query(User.username).order_by(User.id).limit(1).scalar()
+    if listing is None or message is None or liker_id is None:
+        raise ValueError("check-plans needs a database with listings, likes and messages")
+    return Sample(listing.id, listing.location, listing.user_id, liker_id, *message, username)
+
+def _near() -> Tuple[float, float]:
+    _, lat, lng = DEFAULT_PLACES[0]
+    return lat, lng
+
+# (name, query) pairs; each query is called with a Session and a Sample
+HOT_QUERIES: List[Tuple[str, Callable[[Session, Sample], object]]] = [
+    ("listings: newest", lambda db, s: listing_service.get_listings(db, limit=20)),
+    ("listings: newest after cursor", lambda db, s: listing_service.get_listings(
+        db, limit=20, after=[s.listing_id])),
+    ("listings: price range", lambda db, s: listing_service.get_listings(
+        db, limit=20, min_price=800, max_price=1200, sort='price_asc')),
+    ("listings: bedrooms", lambda db, s: listing_service.get_listings(db, limit=20, bedrooms=2)),
+    ("listings: location", lambda db, s: listing_service.get_listings(db, limit=20, location=s.location)),
+    ("listings: search", lambda db, s: listing_service.get_listings(db, limit=20, search="studio")),
+    ("listings: amenities", lambda db, s: listing_service.get_listings(
+        db, limit=20, amenities=['Parking', 'Gym'])),
+    ("listings: radius", lambda db, s: listing_service.get_listings(
+        db, limit=20, near=_near(), radius_km=1)),
+    ("listings: radius by distance", lambda db, s: listing_service.get_listings(
+        db, limit=20, near=_near(), radius_km=1, sort='distance')),
+    ("listings: stay", lambda db, s: listing_service.get_listings(
+        db, limit=20, move_in=date.today() + timedelta(days=30), move_out=date.today() + timedelta(days=120))),
+    ("listing by id", lambda db, s: listing_service.get_listing_by_id(db, s.listing_id)),
+    ("listings by ids", lambda db, s: listing_service.get_listings_by_ids(
+        db, list(range(s.listing_id - 99, s.listing_id + 1)))),
+    ("user listings", lambda db, s: listing_service.get_user_listings(db, s.owner_id)),
+    ("user liked listings", lambda db, s: listing_service.get_user_liked_listings(db, s.liker_id)),
+    ("liked by me", lambda db, s: likes.liked_listing_ids(db, s.liker_id, range(s.listing_id - 99, s.listing_id + 1))),
+    ("like", lambda db, s: likes.add_likes(db, s.liker_id, [s.listing_id])),
+    ("unlike", lambda db, s: likes.remove_likes(db, s.liker_id, [s.listing_id])),
+    ("batch likes", lambda db, s: likes.set_likes(db, s.liker_id, {s.listing_id: True, s.listing_id - 1: False})),
+    ("conversation messages", lambda db, s: listing_service.get_conversation_messages(
+        db, s.sender_id, s.receiver_id, s.thread_listing_id)),
+    ("conversation messages: new", lambda db, s: listing_service.get_conversation_messages(
+        db, s.sender_id, s.receiver_id, s.thread_listing_id, after_id=s.message_id - 1)),
+    ("conversation messages: older", lambda db, s: listing_service.get_conversation_messages(
+        db, s.sender_id, s.receiver_id, s.thread_listing_id, before_id=s.message_id)),
+    ("mark messages read", lambda db, s: listing_service.mark_messages_as_read(
+        db, s.sender_id, s.receiver_id, s.thread_listing_id, from_id=s.message_id - 1, up_to_id=s.message_id)),
+    ("user conversations", lambda db, s: listing_service.get_user_conversations(db, s.receiver_id)),
+    ("user by username", lambda db, s: db.query(User).filter(User.username == s.username).first()),
+    ("pending emails", lambda db, s: count_pending_emails(db)),
+]
+
+def _sqlite_full_scans(conn: Connection, statement: str, parameters) -> List[str]:
+    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    ordered_page = LIMIT_CLAUSE.search(statement) and not any(SQLITE_SORT_STEP in row[-1] for row in plan)
+    scans = []
+    for position, row in enumerate(plan):
+        match = SQLITE_FULL_SCAN.match(row[-1])
+        if not match or re.sub(r'_\d+$', '', match.group(1)) not in WATCHED_TABLES:
+            continue
+        # The outer loop of an ordered page; inner loops run once per row it reads
+        if ordered_page and position == 0:
+            continue
+        scans.append(match.group(1))
+    return scans
+
+def _postgres_full_scans(conn: Connection, statement: str, parameters) -> List[str]:
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in WATCHED_TABLES:
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+def full_scans(conn: Connection, statements: list) -> List[str]:
+    """Watched tables scanned in full by any of the statements"""
+    explain = _postgres_full_scans if conn.dialect.name == 'postgresql' else _sqlite_full_scans
+    scans = []
+    for statement, parameters in statements:
+        # EXPLAIN cannot take executemany parameters; one row is the same plan
+        if isinstance(parameters, list):
+            parameters = parameters[0] if parameters else ()
+        scans += explain(conn, statement, parameters)
+    return scans
+
+def check_plans(engine: Engine) -> List[Tuple[str, List[str]]]:
+    """Run HOT_QUERIES and return (name, full scans) for each"""
+    results = []
+    with engine.connect() as conn:
+        outer = conn.begin()
+        if conn.dialect.name == 'postgresql':
+            # Small tables make a sequential scan the cheapest plan; this
+            # asks whether an index path exists at all
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        statements = []
+        recording = [True]
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if recording[0]:
+                statements.append((statement, parameters))
+
+        event.listen(conn, 'before_cursor_execute', record)
+        try:
+            with Session(bind=conn, join_transaction_mode='create_savepoint') as db:
+                sample = pick_sample(db)
+                for name, query in HOT_QUERIES:
+                    statements.clear()
+                    query(db, sample)
+                    recording[0] = False
+                    results.append((name, full_scans(conn, [
+                        (statement, parameters) for statement, parameters in statements
+                        if not statement.lstrip().upper().startswith(('SAVEPOINT', 'RELEASE'))
+                    ])))
+                    recording[0] = True
+        finally:
+            event.remove(conn, 'before_cursor_execute', record)
+            outer.rollback()
+    return results
+
+def main(engine: Engine) -> int:
+    """Print one line per hot query; non-zero exit if any scans a watched table"""
+    failed = 0
+    for name, scans in check_plans(engine):
+        if scans:
+            failed += 1
+            print(f"FAIL  {name}: full scan of {', '.join(sorted(set(scans)))}")
+        else:
+            print(f"ok    {name}")
+    print(f"{len(HOT_QUERIES) - failed}/{len(HOT_QUERIES)} hot queries use an index")
+    return 1 if failed else 0
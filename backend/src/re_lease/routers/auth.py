@@ -2,21 +2,24 @@ from datetime import timedelta, datetime
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
 from re_lease.models.users import User
-from re_lease.deps import db_dependency, bcrypt_context, user_dependency
+from re_lease.deps import db_dependency, user_dependency, invalidate_principal
+from re_lease.metrics import InstrumentedAPIRoute
+from re_lease.passwords import password_hasher
 from re_lease.schemas.users import UserCreateRequest, Token
 from re_lease.services.users import create_access_token, authenticate_user
+from re_lease.services.email import enqueue_email, email_sender
 import random
-import smtplib
-from email.mime.text import MIMEText
 
 load_dotenv()
 
 router = APIRouter(
     prefix='/auth',
-    tags=['auth']
+    tags=['auth'],
+    route_class=InstrumentedAPIRoute
 )
 
 SECRET_KEY = os.getenv("AUTH_SECRET_KEY")
@@ -25,34 +28,28 @@ ALGORITHM = os.getenv("AUTH_ALGORITHM")
 # In-memory store for verification codes (for mock/demo)
 verification_codes = {}
 
-def send_verification_email(to_email, code):
-    EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
-    EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-    msg = MIMEText(f"Your verification code is: {code}")
-    msg["Subject"] = "Your Release Verification Code"
-    msg["From"] = EMAIL_ADDRESS
-    msg["To"] = to_email
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        smtp.send_message(msg)
+def send_verification_email(db, to_email, code):
+    """Queue the verification code email; the background sender delivers it"""
+    enqueue_email(db, to_email, "Your Release Verification Code", f"Your verification code is: {code}")
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_user(db: db_dependency, create_user_request: UserCreateRequest):
+def create_user(db: db_dependency, create_user_request: UserCreateRequest):
     if not create_user_request.email.endswith("@gmail.com"):
         raise HTTPException(status_code=400, detail="Only @gmail.com emails are allowed")
     code = str(random.randint(100000, 999999))
     expires_at = datetime.utcnow() + timedelta(minutes=10)
-    send_verification_email(create_user_request.email, code)
     create_user_model = User(
         username=create_user_request.username,
         email=create_user_request.email,
-        password_hash=bcrypt_context.hash(create_user_request.password),
+        password_hash=password_hasher.hash(create_user_request.password),
         verified=False,
         verification_code=code,
         verification_code_expires_at=expires_at
     )
     db.add(create_user_model)
+    send_verification_email(db, create_user_request.email, code)
     db.commit()
+    email_sender.wake()
     return {"message": "User created. Please check your email for the verification code."}
 
 @router.post("/verify")
@@ -62,6 +59,10 @@ async def verify_email(request: Request, db: db_dependency):
     code = data.get("code")
     if not email or not code:
         raise HTTPException(status_code=400, detail="Email and code are required")
+    # The lookup and commit block, so run them off the event loop
+    return await run_in_threadpool(_verify_user_email, db, email, code)
+
+def _verify_user_email(db, email, code):
     user = db.query(User).filter(User.email == email).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -75,10 +76,11 @@ async def verify_email(request: Request, db: db_dependency):
     user.verification_code = None  # Clear the code after successful verification
     user.verification_code_expires_at = None
     db.commit()
+    invalidate_principal(user.id)
     return {"message": "Email verified successfully."}
 
 @router.post('/token', response_model=Token)
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: db_dependency):
+def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: db_dependency):
     user = authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user")
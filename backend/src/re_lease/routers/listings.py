@@ -1,12 +1,22 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
+import hashlib
+from datetime import date
+from typing import List, NamedTuple, Optional, Set, Tuple
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Response, Header, WebSocket
 from sqlalchemy.orm import Session
-from ..deps import db_dependency, user_dependency
+from ..deps import db_dependency, user_dependency, optional_user_dependency, authenticate_websocket
+from ..metrics import InstrumentedAPIRoute
+from ..cache import listing_page_cache, listings_generation
 from ..models.users import User
+from ..models.listings import Listing
 from ..schemas.listings import (
     ListingCreate, 
     ListingUpdate, 
     ListingResponse, 
+    ListingBatchResponse,
+    LikeBatchRequest,
+    LikeBatchResponse,
+    MAX_BATCH_SIZE,
     MessageCreate, 
     MessageResponse,
     ConversationResponse
@@ -14,136 +24,258 @@ from ..schemas.listings import (
 from ..services.listings import (
     create_listing,
     get_listings,
+    encode_listing_cursor,
+    decode_listing_cursor,
+    LISTING_SORTS,
     get_listing_by_id,
+    get_listings_by_ids,
     get_user_listings,
+    get_user_liked_listings,
     update_listing,
     delete_listing,
     increment_listing_views,
     increment_listing_interested,
+    get_listing_counts,
     create_message,
     get_conversation_messages,
+    get_usernames,
     get_user_conversations,
-    mark_messages_as_read
+    mark_messages_as_read,
+    MESSAGE_PAGE_SIZE,
+    MAX_MESSAGE_PAGE_SIZE
 )
-import json
+from ..services.amenities import normalize_amenity_names
+from ..services.geo import parse_point, parse_bbox, distance_km
+from ..services.realtime import message_hub
+from ..services.likes import add_like, remove_like, set_likes, liked_listing_ids
+from ..serialization import ORJSONResponse, listing_dict, encode_json
 
 router = APIRouter(
     prefix='/listings',
-    tags=['listings']
+    tags=['listings'],
+    route_class=InstrumentedAPIRoute
 )
 
+class CachedListingPage(NamedTuple):
+    body: bytes
+    etag: str
+    next_cursor: Optional[str]
+    # Per-listing JSON without liked_by_me, to render a signed-in viewer's copy
+    ids: Tuple[int, ...]
+    rows: Tuple[bytes, ...]
+
+def _page_body(page_rows: Tuple[bytes, ...], ids: Tuple[int, ...], liked: Optional[Set[int]]) -> bytes:
+    """A JSON list of the rows with liked_by_me appended to each (null when liked is None)"""
+    if liked is None:
+        flags = [b'null'] * len(ids)
+    else:
+        flags = [b'true' if listing_id in liked else b'false' for listing_id in ids]
+    return b'[' + b','.join(row[:-1] + b',"liked_by_me":' + flag + b'}' for row, flag in zip(page_rows, flags)) + b']'
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
 @router.post("/", response_model=ListingResponse, status_code=status.HTTP_201_CREATED)
-async def create_new_listing(
+def create_new_listing(
     listing_data: ListingCreate,
     db: db_dependency,
     current_user: user_dependency
 ):
     """Create a new listing"""
     db_listing = create_listing(db, listing_data, current_user.id)
-    
-    # Convert JSON fields back to lists for response
-    amenities = json.loads(db_listing.amenities) if db_listing.amenities else []
-    images = json.loads(db_listing.images) if db_listing.images else []
-    
-    return ListingResponse(
-        id=db_listing.id,
-        title=db_listing.title,
-        description=db_listing.description,
-        price=db_listing.price,
-        location=db_listing.location,
-        bedrooms=db_listing.bedrooms,
-        bathrooms=db_listing.bathrooms,
-        available_from=db_listing.available_from,
-        amenities=amenities,
-        images=images,
-        status=db_listing.status,
-        views=db_listing.views,
-        interested=db_listing.interested,
-        created_at=db_listing.created_at,
-        updated_at=db_listing.updated_at,
-        user_id=db_listing.user_id,
-        user_username=current_user.username
-    )
+    return ORJSONResponse(listing_dict(db_listing, current_user.username), status_code=status.HTTP_201_CREATED)
 
 @router.get("/", response_model=List[ListingResponse])
-async def get_all_listings(
+def get_all_listings(
     db: db_dependency,
+    viewer: optional_user_dependency,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     search: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
     location: Optional[str] = Query(None),
-    bedrooms: Optional[int] = Query(None, ge=1)
+    bedrooms: Optional[int] = Query(None, ge=1),
+    amenities: Optional[List[str]] = Query(None, description="Required amenities, comma-separated or repeated"),
+    move_in: Optional[date] = Query(None, description="First day of the stay"),
+    move_out: Optional[date] = Query(None, description="Last day of the stay"),
+    near: Optional[str] = Query(None, description="lat,lng to search around"),
+    radius: float = Query(5, gt=0, le=100, description="Search radius around `near` in km"),
+    bbox: Optional[str] = Query(None, description="min_lng,min_lat,max_lng,max_lat"),
+    sort: Optional[str] = Query(None, pattern=r"^(relevance|distance|newest|price_asc|price_desc)$"),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None)
 ):
-    """Get all listings with optional filters"""
-    db_listings = get_listings(
-        db, skip=skip, limit=limit, search=search,
-        min_price=min_price, max_price=max_price,
-        location=location, bedrooms=bedrooms
+    """Get all listings with optional filters.
+
+    Pages are ordered by relevance when searching and newest first otherwise.
+    `near` limits results to `radius` km around a point and enables
+    sort=distance; `bbox` limits them to a box. Both use the spatial index.
+    `move_in`/`move_out` keep listings available for any part of the stay.
+    For keyset sorts the next page's cursor is returned in X-Next-Cursor.
+    Serialized pages are cached until the next listing write or the cache
+    TTL, and carry an ETag so unchanged pages can be answered with 304.
+    Signed-in viewers get liked_by_me filled in with one query per page.
+    """
+    after = None
+    if cursor:
+        try:
+            sort, after = decode_listing_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    elif sort is None or sort == 'relevance':
+        sort = 'relevance' if search else 'newest'
+    
+    try:
+        point = parse_point(near) if near else None
+        box = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if move_in and move_out and move_out < move_in:
+        raise HTTPException(status_code=400, detail="move_out must not be before move_in")
+    if sort == 'distance' and point is None:
+        raise HTTPException(status_code=400, detail="sort=distance requires near")
+    radius = radius if point is not None else None
+    
+    if search:
+        search = " ".join(search.lower().split())
+    if location == "Any location":
+        location = None
+    if amenities:
+        amenities = sorted(normalize_amenity_names(
+            name for value in amenities for name in value.split(',')
+        ), key=str.lower) or None
+    cache_key = (
+        listings_generation.value, skip if after is None else 0, limit, search,
+        min_price, max_price, location, bedrooms, tuple(amenities or ()),
+        move_in, move_out, point, radius, box,
+        sort, tuple(after or ())
     )
+    page = listing_page_cache.get(cache_key)
+    if page is None:
+        page = _build_listings_page(
+            db, skip=skip, limit=limit, search=search,
+            min_price=min_price, max_price=max_price,
+            location=location, bedrooms=bedrooms,
+            amenities=amenities, move_in=move_in, move_out=move_out, near=point, radius_km=radius, bbox=box,
+            sort=sort, after=after
+        )
+        listing_page_cache.set(cache_key, page)
     
-    listings_response = []
-    for listing in db_listings:
-        amenities = json.loads(listing.amenities) if listing.amenities else []
-        images = json.loads(listing.images) if listing.images else []
-        
-        listings_response.append(ListingResponse(
-            id=listing.id,
-            title=listing.title,
-            description=listing.description,
-            price=listing.price,
-            location=listing.location,
-            bedrooms=listing.bedrooms,
-            bathrooms=listing.bathrooms,
-            available_from=listing.available_from,
-            amenities=amenities,
-            images=images,
-            status=listing.status,
-            views=listing.views,
-            interested=listing.interested,
-            created_at=listing.created_at,
-            updated_at=listing.updated_at,
-            user_id=listing.user_id,
-            user_username=listing.user.username
-        ))
+    body, etag = page.body, page.etag
+    if viewer is not None and page.ids:
+        body = _page_body(page.rows, page.ids, liked_listing_ids(db, viewer.id, page.ids))
+        etag = _etag(body)
     
-    return listings_response
+    headers = {'ETag': etag}
+    if page.next_cursor:
+        headers['X-Next-Cursor'] = page.next_cursor
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+def _build_listings_page(db: Session, limit: int, sort: str, **filters) -> CachedListingPage:
+    db_listings = get_listings(db, limit=limit, sort=sort, **filters)
+    
+    next_cursor = None
+    if sort in LISTING_SORTS and len(db_listings) == limit:
+        next_cursor = encode_listing_cursor(sort, db_listings[-1])
+    
+    near = filters.get('near')
+    ids = tuple(listing.id for listing in db_listings)
+    rows = []
+    for listing in db_listings:
+        row = listing_dict(listing, listing.user.username, distance_km=_distance_from(near, listing))
+        del row['liked_by_me']
+        rows.append(encode_json(row))
+    rows = tuple(rows)
+    body = _page_body(rows, ids, None)
+    return CachedListingPage(body, _etag(body), next_cursor, ids, rows)
+
+def _distance_from(near: Optional[tuple], listing) -> Optional[float]:
+    if near is None or listing.latitude is None or listing.longitude is None:
+        return None
+    return round(distance_km(near[0], near[1], listing.latitude, listing.longitude), 3)
+
+def warm_listing_cache(db: Session):
+    """Build the unfiltered first page, the one every visitor lands on"""
+    cache_key = (
+        listings_generation.value, 0, 100, None, None, None, None, None, (),
+        None, None, None, None, None, 'newest', ()
+    )
+    listing_page_cache.set(cache_key, _build_listings_page(db, limit=100, sort='newest'))
 
 @router.get("/liked", response_model=List[ListingResponse])
-async def get_liked_listings(
+def get_liked_listings(
     db: db_dependency,
     current_user: user_dependency
 ):
-    user = db.query(User).filter(User.id == current_user.id).first()
+    return ORJSONResponse([
+        listing_dict(listing, listing.user.username, liked_by_me=True)
+        for listing in get_user_liked_listings(db, current_user.id)
+    ])
+
+@router.get("/batch", response_model=ListingBatchResponse)
+def get_listings_batch(
+    db: db_dependency,
+    current_user: user_dependency,
+    ids: List[str] = Query(..., description=f"Listing ids, comma-separated or repeated, at most {MAX_BATCH_SIZE}")
+):
+    """Get several listings in one request, in the order requested.
+
+    Duplicate ids are returned once; ids with no listing are reported in
+    `missing`. Unlike GET /listings/{id} this does not count as a view.
+    """
+    listing_ids = []
+    try:
+        for value in ids:
+            listing_ids.extend(int(part) for part in value.split(',') if part.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be integers")
+    listing_ids = list(dict.fromkeys(listing_ids))
+    if len(listing_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per request")
+    
+    db_listings = get_listings_by_ids(db, listing_ids)
+    liked = liked_listing_ids(db, current_user.id, [listing.id for listing in db_listings])
+    found = {listing.id for listing in db_listings}
+    
     listings_response = []
-    for listing in user.liked_listings:
-        amenities = json.loads(listing.amenities) if listing.amenities else []
-        images = json.loads(listing.images) if listing.images else []
-        listings_response.append(ListingResponse(
-            id=listing.id,
-            title=listing.title,
-            description=listing.description,
-            price=listing.price,
-            location=listing.location,
-            bedrooms=listing.bedrooms,
-            bathrooms=listing.bathrooms,
-            available_from=listing.available_from,
-            amenities=amenities,
-            images=images,
-            status=listing.status,
-            views=listing.views,
-            interested=listing.interested,
-            created_at=listing.created_at,
-            updated_at=listing.updated_at,
-            user_id=listing.user_id,
-            user_username=listing.user.username
+    for listing in db_listings:
+        views, interested = get_listing_counts(listing)
+        listings_response.append(listing_dict(
+            listing, listing.user.username,
+            views=views, interested=interested, liked_by_me=listing.id in liked
         ))
-    return listings_response
+    return ORJSONResponse({
+        'listings': listings_response,
+        'missing': [listing_id for listing_id in listing_ids if listing_id not in found]
+    })
+
+@router.post("/likes/batch", response_model=LikeBatchResponse)
+def set_likes_batch(
+    batch: LikeBatchRequest,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """Apply many like/unlike changes in one transaction, e.g. when syncing offline actions.
 
+    Changes are applied in order, so the last one for a listing wins;
+    repeating a change is a no-op. Ids with no listing are reported in
+    `missing` and do not fail the batch.
+    """
+    changes = {change.listing_id: change.liked for change in batch.changes}
+    liked, unliked, missing = set_likes(db, current_user.id, changes)
+    return LikeBatchResponse(liked=sorted(liked), unliked=sorted(unliked), missing=sorted(missing))
 
 @router.get("/{listing_id}", response_model=ListingResponse)
-async def get_listing(
+def get_listing(
     listing_id: int,
     db: db_dependency,
     current_user: user_dependency
@@ -154,103 +286,47 @@ async def get_listing(
         raise HTTPException(status_code=404, detail="Listing not found")
     
     # Increment view count
-    increment_listing_views(db, listing_id)
+    increment_listing_views(listing_id)
+    views, interested = get_listing_counts(db_listing)
+    liked = bool(liked_listing_ids(db, current_user.id, [listing_id]))
     
-    amenities = json.loads(db_listing.amenities) if db_listing.amenities else []
-    images = json.loads(db_listing.images) if db_listing.images else []
-    
-    return ListingResponse(
-        id=db_listing.id,
-        title=db_listing.title,
-        description=db_listing.description,
-        price=db_listing.price,
-        location=db_listing.location,
-        bedrooms=db_listing.bedrooms,
-        bathrooms=db_listing.bathrooms,
-        available_from=db_listing.available_from,
-        amenities=amenities,
-        images=images,
-        status=db_listing.status,
-        views=db_listing.views,
-        interested=db_listing.interested,
-        created_at=db_listing.created_at,
-        updated_at=db_listing.updated_at,
-        user_id=db_listing.user_id,
-        user_username=db_listing.user.username
-    )
+    return ORJSONResponse(listing_dict(
+        db_listing, db_listing.user.username, views=views, interested=interested, liked_by_me=liked
+    ))
 
 @router.get("/my/listings", response_model=List[ListingResponse])
-async def get_my_listings(
+def get_my_listings(
     db: db_dependency,
     current_user: user_dependency
 ):
     """Get all listings created by the current user"""
     db_listings = get_user_listings(db, current_user.id)
+    liked = liked_listing_ids(db, current_user.id, [listing.id for listing in db_listings])
     
-    listings_response = []
-    for listing in db_listings:
-        amenities = json.loads(listing.amenities) if listing.amenities else []
-        images = json.loads(listing.images) if listing.images else []
-        
-        listings_response.append(ListingResponse(
-            id=listing.id,
-            title=listing.title,
-            description=listing.description,
-            price=listing.price,
-            location=listing.location,
-            bedrooms=listing.bedrooms,
-            bathrooms=listing.bathrooms,
-            available_from=listing.available_from,
-            amenities=amenities,
-            images=images,
-            status=listing.status,
-            views=listing.views,
-            interested=listing.interested,
-            created_at=listing.created_at,
-            updated_at=listing.updated_at,
-            user_id=listing.user_id,
-            user_username=current_user.username
-        ))
-    
-    return listings_response
+    return ORJSONResponse([
+        listing_dict(listing, current_user.username, liked_by_me=listing.id in liked)
+        for listing in db_listings
+    ])
 
 @router.put("/{listing_id}", response_model=ListingResponse)
-async def update_listing_by_id(
+def update_listing_by_id(
     listing_id: int,
     listing_data: ListingUpdate,
     db: db_dependency,
     current_user: user_dependency
 ):
     """Update a listing"""
-    db_listing = update_listing(db, listing_id, listing_data, current_user.id)
+    try:
+        db_listing = update_listing(db, listing_id, listing_data, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not db_listing:
         raise HTTPException(status_code=404, detail="Listing not found or not authorized")
     
-    amenities = json.loads(db_listing.amenities) if db_listing.amenities else []
-    images = json.loads(db_listing.images) if db_listing.images else []
-    
-    return ListingResponse(
-        id=db_listing.id,
-        title=db_listing.title,
-        description=db_listing.description,
-        price=db_listing.price,
-        location=db_listing.location,
-        bedrooms=db_listing.bedrooms,
-        bathrooms=db_listing.bathrooms,
-        available_from=db_listing.available_from,
-        amenities=amenities,
-        images=images,
-        status=db_listing.status,
-        views=db_listing.views,
-        interested=db_listing.interested,
-        created_at=db_listing.created_at,
-        updated_at=db_listing.updated_at,
-        user_id=db_listing.user_id,
-        user_username=current_user.username
-    )
+    return ORJSONResponse(listing_dict(db_listing, current_user.username))
 
 @router.delete("/{listing_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_listing_by_id(
+def delete_listing_by_id(
     listing_id: int,
     db: db_dependency,
     current_user: user_dependency
@@ -261,7 +337,7 @@ async def delete_listing_by_id(
         raise HTTPException(status_code=404, detail="Listing not found or not authorized")
 
 @router.post("/{listing_id}/interested", status_code=status.HTTP_200_OK)
-async def mark_listing_as_interested(
+def mark_listing_as_interested(
     listing_id: int,
     db: db_dependency,
     current_user: user_dependency
@@ -271,45 +347,37 @@ async def mark_listing_as_interested(
     if not db_listing:
         raise HTTPException(status_code=404, detail="Listing not found")
     
-    increment_listing_interested(db, listing_id)
+    increment_listing_interested(listing_id)
     return {"message": "Listing marked as interested"}
 
 @router.post("/{listing_id}/like", status_code=status.HTTP_200_OK)
-async def like_listing(
+def like_listing(
     listing_id: int = Path(...),
     db: db_dependency = None,
     current_user: user_dependency = None
 ):
-    listing = get_listing_by_id(db, listing_id)
-    if not listing:
+    if add_like(db, current_user.id, listing_id):
+        return {"message": "Listing liked"}
+    if db.query(Listing.id).filter(Listing.id == listing_id).first() is None:
         raise HTTPException(status_code=404, detail="Listing not found")
-    user = db.query(User).filter(User.id == current_user.id).first()
-    if listing in user.liked_listings:
-        return {"message": "Already liked"}
-    user.liked_listings.append(listing)
-    db.commit()
-    return {"message": "Listing liked"}
+    return {"message": "Already liked"}
 
 @router.post("/{listing_id}/unlike", status_code=status.HTTP_200_OK)
-async def unlike_listing(
+def unlike_listing(
     listing_id: int = Path(...),
     db: db_dependency = None,
     current_user: user_dependency = None
 ):
-    listing = get_listing_by_id(db, listing_id)
-    if not listing:
+    if remove_like(db, current_user.id, listing_id):
+        return {"message": "Listing unliked"}
+    if db.query(Listing.id).filter(Listing.id == listing_id).first() is None:
         raise HTTPException(status_code=404, detail="Listing not found")
-    user = db.query(User).filter(User.id == current_user.id).first()
-    if listing not in user.liked_listings:
-        return {"message": "Not liked"}
-    user.liked_listings.remove(listing)
-    db.commit()
-    return {"message": "Listing unliked"}
+    return {"message": "Not liked"}
 
 
 # Message endpoints
 @router.post("/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def send_message(
+def send_message(
     message_data: MessageCreate,
     db: db_dependency,
     current_user: user_dependency
@@ -329,7 +397,10 @@ async def send_message(
     if current_user.id == message_data.receiver_id:
         raise HTTPException(status_code=400, detail="Cannot send message to yourself")
     
-    db_message = create_message(db, message_data, current_user.id)
+    db_message = create_message(
+        db, message_data, current_user.id,
+        usernames={current_user.id: current_user.username, receiver.id: receiver.username}
+    )
     
     return MessageResponse(
         id=db_message.id,
@@ -343,8 +414,25 @@ async def send_message(
         receiver_username=receiver.username
     )
 
+@router.websocket("/messages/ws")
+async def message_events(websocket: WebSocket, token: Optional[str] = None):
+    """Push new messages, read receipts and unread counts to the current user.
+
+    Browsers cannot set headers on a WebSocket, so the bearer token may be
+    passed as ?token= instead of an Authorization header.
+    """
+    authorization = websocket.headers.get('authorization', '')
+    if not token and authorization.lower().startswith('bearer '):
+        token = authorization[len('bearer '):]
+    principal = await to_thread.run_sync(authenticate_websocket, token)
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await message_hub.serve(websocket, principal.id)
+
 @router.get("/messages/conversations", response_model=List[ConversationResponse])
-async def get_conversations(
+def get_conversations(
     db: db_dependency,
     current_user: user_dependency
 ):
@@ -367,18 +455,26 @@ async def get_conversations(
     return conversations_response
 
 @router.get("/messages/{other_user_id}/{listing_id}", response_model=List[MessageResponse])
-async def get_conversation_messages_endpoint(
+def get_conversation_messages_endpoint(
     other_user_id: int,
     listing_id: int,
     db: db_dependency,
-    current_user: user_dependency
+    current_user: user_dependency,
+    after_id: Optional[int] = Query(None, ge=0, description="Only messages newer than this id"),
+    before_id: Optional[int] = Query(None, ge=0, description="Only messages older than this id"),
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE)
 ):
-    """Get messages between current user and another user for a specific listing"""
-    messages = get_conversation_messages(db, current_user.id, other_user_id, listing_id)
-    
-    # Mark messages as read
-    mark_messages_as_read(db, other_user_id, current_user.id, listing_id)
+    """Get messages between current user and another user for a specific listing, oldest first.
+
+    Without cursors this is the newest page. Poll with after_id set to the
+    last id received for new messages; pass before_id set to the first id
+    received to scroll back.
+    """
+    messages = get_conversation_messages(
+        db, current_user.id, other_user_id, listing_id, after_id=after_id, before_id=before_id, limit=limit
+    )
     
+    usernames = get_usernames(db, (current_user.id, other_user_id)) if messages else {}
     messages_response = []
     for message in messages:
         messages_response.append(MessageResponse(
@@ -389,8 +485,16 @@ async def get_conversation_messages_endpoint(
             listing_id=message.listing_id,
             is_read=message.is_read,
             created_at=message.created_at,
-            sender_username=message.sender.username,
-            receiver_username=message.receiver.username
+            sender_username=usernames.get(message.sender_id, "Unknown"),
+            receiver_username=usernames.get(message.receiver_id, "Unknown")
         ))
     
-    return messages_response 
\ No newline at end of file
+    # Mark read only what this page delivered: a page is a contiguous id
+    # range of the thread, so older unread messages it skipped stay unread.
+    # After building the response, as the commit expires the loaded rows.
+    if messages:
+        mark_messages_as_read(
+            db, other_user_id, current_user.id, listing_id, from_id=messages[0].id, up_to_id=messages[-1].id
+        )
+    
+    return messages_response
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional
 from re_lease.deps import db_dependency, user_dependency
+from re_lease.metrics import InstrumentedAPIRoute
 from re_lease.models.users import User
 from pydantic import BaseModel
 
 router = APIRouter(
     prefix='/users',
-    tags=['users']
+    tags=['users'],
+    route_class=InstrumentedAPIRoute
 )
 
 class SocialLink(BaseModel):
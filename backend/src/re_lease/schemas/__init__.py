@@ -3,6 +3,9 @@ from .listings import (
     ListingCreate, 
     ListingUpdate, 
     ListingResponse, 
+    ListingBatchResponse,
+    LikeBatchRequest,
+    LikeBatchResponse,
     MessageCreate, 
     MessageResponse,
     ConversationResponse
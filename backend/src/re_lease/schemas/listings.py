@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 from datetime import datetime
 
@@ -7,12 +7,22 @@ class ListingBase(BaseModel):
     description: str
     price: float
     location: str
+    # Geocoded from location when not given
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     bedrooms: int
     bathrooms: float
     available_from: datetime
+    available_to: Optional[datetime] = None  # None: open-ended
     amenities: Optional[List[str]] = []
     images: Optional[List[str]] = []
 
+    @model_validator(mode='after')
+    def check_availability(self):
+        if self.available_to is not None and self.available_to < self.available_from:
+            raise ValueError("available_to must not be before available_from")
+        return self
+
 class ListingCreate(ListingBase):
     pass
 
@@ -21,9 +31,12 @@ class ListingUpdate(BaseModel):
     description: Optional[str] = None
     price: Optional[float] = None
     location: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     bedrooms: Optional[int] = None
     bathrooms: Optional[float] = None
     available_from: Optional[datetime] = None
+    available_to: Optional[datetime] = None
     amenities: Optional[List[str]] = None
     images: Optional[List[str]] = None
     status: Optional[str] = None
@@ -37,10 +50,36 @@ class ListingResponse(ListingBase):
     updated_at: Optional[datetime]
     user_id: int
     user_username: str
+    like_count: int = 0
+    # Only set for searches with `near`
+    distance_km: Optional[float] = None
+    # Whether the signed-in viewer liked it; None for anonymous requests
+    liked_by_me: Optional[bool] = None
 
     class Config:
         from_attributes = True
 
+# Most listings or like changes one batch request may carry
+MAX_BATCH_SIZE = 100
+
+class ListingBatchResponse(BaseModel):
+    # In the order requested; ids that do not exist are listed in missing
+    listings: List[ListingResponse]
+    missing: List[int]
+
+class LikeChange(BaseModel):
+    listing_id: int
+    liked: bool
+
+class LikeBatchRequest(BaseModel):
+    # Applied in order, so the last change to a listing wins
+    changes: List[LikeChange] = Field(..., max_length=MAX_BATCH_SIZE)
+
+class LikeBatchResponse(BaseModel):
+    liked: List[int]
+    unliked: List[int]
+    missing: List[int]
+
 class MessageBase(BaseModel):
     text: str
     listing_id: int
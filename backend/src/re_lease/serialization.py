@@ -0,0 +1,71 @@
+"""Fast path from Listing rows to JSON responses.
+
+Listing rows come from our own database, so mapping them to the
+ListingResponse shape does not need pydantic validation: listing_dict
+builds the plain dict directly, decoding the JSON columns once, and
+ORJSONResponse encodes it with orjson. Route handlers return the
+response object themselves, which also skips FastAPI's re-validation
+against response_model (still declared, for the OpenAPI schema).
+"""
+from typing import Any, Optional
+import orjson
+from fastapi import Response
+
+# Matches pydantic's output: UTC datetimes end in Z, naive ones carry no offset
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+def decode_json_list(raw: Optional[str]) -> list:
+    """A JSON list column (amenities, images) as a list; [] when empty or unset"""
+    return orjson.loads(raw) if raw else []
+
+def listing_dict(
+    listing,
+    username: str,
+    views: Optional[int] = None,
+    interested: Optional[int] = None,
+    distance_km: Optional[float] = None,
+    liked_by_me: Optional[bool] = None
+) -> dict:
+    """A ListingResponse-shaped dict for a trusted Listing row, keys in field order.
+
+    views/interested default to the stored counts; pass the values from
+    get_listing_counts to include unflushed increments.
+    """
+    return {
+        'title': listing.title,
+        'description': listing.description,
+        'price': listing.price,
+        'location': listing.location,
+        'latitude': listing.latitude,
+        'longitude': listing.longitude,
+        'bedrooms': listing.bedrooms,
+        'bathrooms': listing.bathrooms,
+        'available_from': listing.available_from,
+        'available_to': listing.available_to,
+        'amenities': decode_json_list(listing.amenities),
+        'images': decode_json_list(listing.images),
+        'id': listing.id,
+        'status': listing.status,
+        'views': listing.views if views is None else views,
+        'interested': listing.interested if interested is None else interested,
+        'created_at': listing.created_at,
+        'updated_at': listing.updated_at,
+        'user_id': listing.user_id,
+        'user_username': username,
+        'like_count': listing.like_count,
+        'distance_km': distance_km,
+        'liked_by_me': liked_by_me,
+    }
+
+def encode_json(content: Any) -> bytes:
+    """content as JSON bytes, formatted the way pydantic would"""
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+class ORJSONResponse(Response):
+    """JSON response encoded with orjson; bytes content is sent as already encoded"""
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return encode_json(content)
@@ -2,14 +2,23 @@ from .users import create_access_token, authenticate_user
 from .listings import (
     create_listing,
     get_listings,
+    encode_listing_cursor,
+    decode_listing_cursor,
+    LISTING_SORTS,
     get_listing_by_id,
+    get_listings_by_ids,
     get_user_listings,
+    get_user_liked_listings,
     update_listing,
     delete_listing,
     increment_listing_views,
     increment_listing_interested,
+    get_listing_counts,
     create_message,
     get_conversation_messages,
+    get_usernames,
     get_user_conversations,
-    mark_messages_as_read
-) 
\ No newline at end of file
+    mark_messages_as_read,
+    rebuild_conversations
+)
+from .amenities import get_or_create_amenities, backfill_listing_amenities 
\ No newline at end of file
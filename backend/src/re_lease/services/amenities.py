@@ -0,0 +1,97 @@
+import json
+from collections import defaultdict
+from typing import Iterable, List, Optional
+from sqlalchemy import exists, false, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Query, Session
+from ..models.listings import Amenity, Listing, listing_amenities
+
+def normalize_amenity_names(names: Optional[Iterable[str]]) -> List[str]:
+    """Strip blanks and drop case-insensitive duplicates, keeping the first spelling"""
+    unique = {}
+    for name in names or ():
+        name = name.strip() if isinstance(name, str) else ''
+        if name:
+            unique.setdefault(name.lower(), name)
+    return list(unique.values())
+
+def get_or_create_amenities(db: Session, names: Optional[Iterable[str]]) -> List[Amenity]:
+    """Amenity rows for the given names (matched case-insensitively), creating unknown ones"""
+    names = normalize_amenity_names(names)
+    if not names:
+        return []
+    known = {}
+    # Oldest row first where spellings differing in case were stored separately
+    for amenity in db.query(Amenity).filter(
+        func.lower(Amenity.name).in_([name.lower() for name in names])
+    ).order_by(Amenity.id):
+        known.setdefault(amenity.name.lower(), amenity)
+    amenities = []
+    for name in names:
+        amenity = known.get(name.lower())
+        if amenity is None:
+            try:
+                with db.begin_nested():
+                    amenity = Amenity(name=name)
+                    db.add(amenity)
+            except IntegrityError:
+                # Created concurrently by another request
+                amenity = db.query(Amenity).filter(Amenity.name == name).one()
+            known[name.lower()] = amenity
+        amenities.append(amenity)
+    return amenities
+
+def apply_amenity_filter(query: Query, db: Session, names: List[str]) -> Query:
+    """Keep listings that have every one of the named amenities"""
+    names = normalize_amenity_names(names)
+    if not names:
+        return query
+    # One name can have several rows that differ only in case (the unique
+    # constraint is case-sensitive), and a listing may carry any of them
+    amenity_ids = defaultdict(list)
+    for amenity_id, name in db.query(Amenity.id, Amenity.name).filter(
+        func.lower(Amenity.name).in_([name.lower() for name in names])
+    ):
+        amenity_ids[name.lower()].append(amenity_id)
+    if len(amenity_ids) < len(names):
+        # An amenity nobody has listed yet: nothing can match
+        return query.filter(false())
+    for ids in amenity_ids.values():
+        query = query.filter(exists().where(
+            listing_amenities.c.listing_id == Listing.id,
+            listing_amenities.c.amenity_id.in_(ids)
+        ))
+    return query
+
+def backfill_listing_amenities(conn: Connection, after_id: int = 0, batch_size: int = 10000) -> int:
+    """Fill listing_amenities from the JSON amenities column of listings with id > after_id.
+
+    Returns the number of links written.
+    """
+    amenity_ids = {name.lower(): amenity_id for amenity_id, name in conn.execute(select(Amenity.id, Amenity.name))}
+    written = 0
+    while True:
+        rows = conn.execute(
+            select(Listing.id, Listing.amenities)
+            .where(Listing.id > after_id, Listing.amenities.isnot(None))
+            .order_by(Listing.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return written
+        after_id = rows[-1][0]
+        links = []
+        for listing_id, raw in rows:
+            try:
+                names = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(names, list):
+                continue
+            for name in normalize_amenity_names(names):
+                if name.lower() not in amenity_ids:
+                    amenity_ids[name.lower()] = conn.execute(insert(Amenity).values(name=name)).inserted_primary_key[0]
+                links.append({'listing_id': listing_id, 'amenity_id': amenity_ids[name.lower()]})
+        if links:
+            conn.execute(insert(listing_amenities), links)
+        written += len(links)
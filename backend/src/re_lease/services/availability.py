@@ -0,0 +1,50 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import text, func, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query
+from ..models.listings import Listing
+
+# Postgres: GiST index over each listing's availability as a range, so
+# window overlaps are a single indexed && test. The planner's range
+# statistics decide when it beats walking a sort-order index.
+#
+# SQLite gets no date index on purpose: without STAT4 histograms the planner
+# picks any (available_from, ...) B-tree for every page and then sorts every
+# match, while walking the id/price indexes stops after one page.
+POSTGRES_AVAILABILITY_DDL = [
+    """
+    CREATE INDEX IF NOT EXISTS ix_listings_availability ON listings
+    USING gist (tsrange(available_from, available_to, '[]'))
+    """,
+]
+
+def install_availability_index(engine: Engine):
+    """Create the availability range index where the dialect has one"""
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            for statement in POSTGRES_AVAILABILITY_DDL:
+                conn.execute(text(statement))
+
+def apply_availability_filter(query: Query, dialect: str, move_in: Optional[date] = None,
+                              move_out: Optional[date] = None) -> Query:
+    """Keep listings whose availability overlaps the stay from move_in through move_out.
+
+    Either end may be omitted to leave the stay open on that side. A listing
+    without available_to is available indefinitely.
+    """
+    start = datetime.combine(move_in, time.min) if move_in else None
+    # Dates are whole days, so the stay ends at the start of the day after move_out
+    end = datetime.combine(move_out + timedelta(days=1), time.min) if move_out else None
+    if start is None and end is None:
+        return query
+
+    if dialect == 'postgresql':
+        available = func.tsrange(Listing.available_from, Listing.available_to, '[]')
+        return query.filter(available.op('&&')(func.tsrange(start, end, '[)')))
+
+    if end is not None:
+        query = query.filter(Listing.available_from < end)
+    if start is not None:
+        query = query.filter(or_(Listing.available_to.is_(None), Listing.available_to >= start))
+    return query
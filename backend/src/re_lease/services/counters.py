@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple
+from sqlalchemy import update, bindparam
+from ..database import SessionLocal
+from ..models.listings import Listing
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('views', 'interested')
+
+class ListingCounterBuffer:
+    """Collects listing view/interest increments in memory and writes them in batches.
+
+    Each flush applies every pending delta as one executemany of
+    `UPDATE listings SET views = views + :n`, so concurrent workers never
+    lose increments and the request path never opens a write transaction.
+    """
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, listing_id: int, field: str, amount: int = 1):
+        """Record an increment to be written on the next flush"""
+        with self._lock:
+            self._pending[listing_id][field] += amount
+
+    def pending(self, listing_id: int) -> Tuple[int, int]:
+        """Unflushed (views, interested) deltas for a listing"""
+        with self._lock:
+            deltas = self._pending.get(listing_id)
+            if deltas is None:
+                return 0, 0
+            return deltas['views'], deltas['interested']
+
+    def pending_listings(self) -> int:
+        """Number of listings with increments not yet written"""
+        return len(self._pending)
+
+    def flush(self):
+        """Write all pending deltas to the database"""
+        with self._lock:
+            batch, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        if not batch:
+            return
+        rows = [
+            {'listing_id': listing_id, 'd_views': deltas['views'], 'd_interested': deltas['interested']}
+            for listing_id, deltas in batch.items()
+        ]
+        statement = update(Listing.__table__).where(
+            Listing.__table__.c.id == bindparam('listing_id')
+        ).values(
+            views=Listing.__table__.c.views + bindparam('d_views'),
+            interested=Listing.__table__.c.interested + bindparam('d_interested')
+        )
+        db = SessionLocal()
+        try:
+            db.connection().execute(statement, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for row in rows:
+                    self._pending[row['listing_id']]['views'] += row['d_views']
+                    self._pending[row['listing_id']]['interested'] += row['d_interested']
+            raise
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error flushing listing counters")
+
+    def start(self):
+        """Start the periodic background flush"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='listing-counter-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background flush and write whatever is still pending"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+listing_counters = ListingCounterBuffer(
+    flush_interval=float(os.getenv('COUNTER_FLUSH_INTERVAL', '5'))
+)
@@ -0,0 +1,237 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from typing import Optional, Protocol
+from dotenv import load_dotenv
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from ..models.emails import OutboundEmail
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '20'))
+EMAIL_POLL_INTERVAL = float(os.getenv('EMAIL_POLL_INTERVAL', '5'))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '6'))
+EMAIL_RETRY_BASE = float(os.getenv('EMAIL_RETRY_BASE', '10'))
+EMAIL_RETRY_MAX = float(os.getenv('EMAIL_RETRY_MAX', '900'))
+# How long a claimed batch is reserved for one sender before others may retry it
+EMAIL_CLAIM_LEASE = float(os.getenv('EMAIL_CLAIM_LEASE', '120'))
+
+class EmailTransport(Protocol):
+    def send(self, to_address: str, subject: str, body: str): ...
+    def close(self): ...
+
+class SMTPTransport:
+    """Delivers over one persistent SMTP connection, reconnecting when it drops or idles out"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_ssl: bool = True,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        sender: Optional[str] = None,
+        idle_timeout: float = 60.0,
+        timeout: float = 30.0
+    ):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        smtp = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def send(self, to_address: str, subject: str, body: str):
+        msg = MIMEText(body)
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = to_address
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped a pooled connection; retry once on a fresh one
+            self._smtp = self._connect()
+            self._smtp.send_message(msg)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._smtp = None
+
+class ConsoleTransport:
+    """Logs emails instead of sending them (local development)"""
+
+    def send(self, to_address: str, subject: str, body: str):
+        logger.info("Email to %s: %s\n%s", to_address, subject, body)
+
+    def close(self):
+        pass
+
+def transport_from_env() -> EmailTransport:
+    """Build the transport selected by EMAIL_TRANSPORT (smtp or console)"""
+    if os.getenv('EMAIL_TRANSPORT', 'smtp') == 'console':
+        return ConsoleTransport()
+    return SMTPTransport(
+        host=os.getenv('SMTP_HOST', 'smtp.gmail.com'),
+        port=int(os.getenv('SMTP_PORT', '465')),
+        use_ssl=os.getenv('SMTP_USE_SSL', 'true').lower() == 'true',
+        username=os.getenv('EMAIL_ADDRESS'),
+        password=os.getenv('EMAIL_PASSWORD'),
+        idle_timeout=float(os.getenv('SMTP_IDLE_TIMEOUT', '60'))
+    )
+
+def enqueue_email(db: Session, to_address: str, subject: str, body: str) -> OutboundEmail:
+    """Queue an email; it is sent after the caller's transaction commits"""
+    email = OutboundEmail(
+        to_address=to_address,
+        subject=subject,
+        body=body,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(email)
+    return email
+
+def count_pending_emails(db: Session) -> int:
+    """Number of emails still waiting to be delivered"""
+    return db.query(func.count(OutboundEmail.id)).filter(OutboundEmail.status == 'pending').scalar()
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff in seconds after the given number of failed attempts"""
+    return min(EMAIL_RETRY_BASE * 2 ** (attempts - 1), EMAIL_RETRY_MAX)
+
+class EmailSender:
+    """Background thread that drains the outbound_emails queue in batches.
+
+    Rows are claimed with a single UPDATE that stamps them with this
+    sender's token and pushes next_attempt_at out by the lease, so several
+    workers can share the queue and a crashed sender's rows are retried
+    once the lease runs out.
+    """
+
+    def __init__(self, transport_factory=transport_from_env, batch_size: int = EMAIL_BATCH_SIZE,
+                 poll_interval: float = EMAIL_POLL_INTERVAL):
+        self.transport_factory = transport_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.token = uuid.uuid4().hex
+        self._transport = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _claim(self, db: Session) -> list:
+        now = datetime.utcnow()
+        due = select(OutboundEmail.id).where(
+            OutboundEmail.status == 'pending',
+            OutboundEmail.next_attempt_at <= now
+        ).order_by(OutboundEmail.id).limit(self.batch_size).with_for_update(skip_locked=True)
+        db.execute(
+            update(OutboundEmail).where(
+                OutboundEmail.id.in_(due.scalar_subquery()),
+                OutboundEmail.status == 'pending',
+                OutboundEmail.next_attempt_at <= now
+            ).values(
+                claimed_by=self.token,
+                next_attempt_at=now + timedelta(seconds=EMAIL_CLAIM_LEASE)
+            ).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return db.query(OutboundEmail).filter(
+            OutboundEmail.claimed_by == self.token,
+            OutboundEmail.status == 'pending'
+        ).order_by(OutboundEmail.id).all()
+
+    def process_batch(self) -> int:
+        """Send one batch of due emails. Returns how many were attempted"""
+        db = SessionLocal()
+        try:
+            batch = self._claim(db)
+            if not batch:
+                return 0
+            if self._transport is None:
+                self._transport = self.transport_factory()
+            for email in batch:
+                email.attempts += 1
+                email.claimed_by = None
+                try:
+                    self._transport.send(email.to_address, email.subject, email.body)
+                except Exception as e:
+                    self._transport.close()
+                    email.last_error = str(e)[:1000]
+                    if email.attempts >= EMAIL_MAX_ATTEMPTS:
+                        email.status = 'failed'
+                    else:
+                        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(email.attempts))
+                else:
+                    email.status = 'sent'
+                    email.sent_at = datetime.utcnow()
+                db.commit()
+            return len(batch)
+        finally:
+            db.close()
+
+    def wake(self):
+        """Check the queue now instead of waiting for the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.process_batch()
+            except Exception:
+                logger.exception("Error sending queued emails")
+                sent = 0
+            if sent < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='email-sender', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+email_sender = EmailSender()
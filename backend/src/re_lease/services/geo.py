@@ -0,0 +1,297 @@
+import math
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from sqlalchemy import text, func, insert, inspect, literal, select, table, column, bindparam
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Query, Session
+from ..models.listings import Listing
+from ..models.places import Place
+
+# SQLite: R*Tree over listing coordinates, kept in sync by triggers. Points
+# are stored as zero-size boxes; rtree rounds outward to 32-bit floats, so
+# callers re-check the exact coordinates after the index lookup.
+SQLITE_GEO_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+    """
+    CREATE TRIGGER IF NOT EXISTS listings_rtree_ai AFTER INSERT ON listings
+    WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO listings_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS listings_rtree_ad AFTER DELETE ON listings BEGIN
+        DELETE FROM listings_rtree WHERE id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS listings_rtree_au AFTER UPDATE OF latitude, longitude ON listings BEGIN
+        DELETE FROM listings_rtree WHERE id = old.id;
+        INSERT INTO listings_rtree SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END
+    """,
+]
+SQLITE_GEO_REBUILD = [
+    "DELETE FROM listings_rtree",
+    """
+    INSERT INTO listings_rtree
+    SELECT id, latitude, latitude, longitude, longitude FROM listings
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """,
+]
+
+# Postgres: GiST index on the built-in point type, so no PostGIS is needed
+POSTGRES_GEO_DDL = [
+    """
+    CREATE INDEX IF NOT EXISTS ix_listings_geo_point ON listings USING gist (point(longitude, latitude))
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """,
+]
+
+listings_rtree = table('listings_rtree', column('id'), column('min_lat'), column('max_lat'),
+                       column('min_lng'), column('max_lng'))
+
+# Above this many R*Tree hits an area is dense enough that walking listings
+# in sort order fills a page sooner than collecting and sorting every hit
+SQLITE_DENSE_AREA_ROWS = 2000
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320
+EARTH_RADIUS_KM = 6371.0
+
+# Local gazetteer seeded into the places table: the neighborhoods listings
+# are posted in, so geocoding never leaves the process
+DEFAULT_PLACES = [
+    ("Downtown", 47.6062, -122.3321),
+    ("Midtown", 47.6150, -122.3270),
+    ("University District", 47.6615, -122.3131),
+    ("Northside", 47.6900, -122.3400),
+    ("Southside", 47.5400, -122.3150),
+    ("East Village", 47.6100, -122.2950),
+    ("West End", 47.6150, -122.3650),
+    ("Old Town", 47.6015, -122.3343),
+    ("Riverside", 47.5500, -122.3400),
+    ("Harbor", 47.6030, -122.3400),
+    ("Hillcrest", 47.6250, -122.3000),
+    ("Lakeview", 47.6390, -122.3300),
+    ("Greenwood", 47.6910, -122.3550),
+    ("Capitol Hill", 47.6253, -122.3222),
+    ("Fremont", 47.6505, -122.3500),
+    ("Ballard", 47.6687, -122.3845),
+    ("Uptown", 47.6230, -122.3560),
+    ("Arts District", 47.5980, -122.3240),
+    ("Chinatown", 47.5980, -122.3260),
+    ("Mission", 47.5700, -122.3300),
+    ("Oak Park", 47.7000, -122.3000),
+    ("Maple Heights", 47.5600, -122.2900),
+    ("Cedar Grove", 47.5200, -122.3600),
+    ("Pine Ridge", 47.7100, -122.3700),
+    ("Westwood", 47.5200, -122.3700),
+    ("Eastgate", 47.5800, -122.1500),
+    ("Parkside", 47.6800, -122.2900),
+    ("Bayview", 47.6400, -122.4000),
+    ("Sunset", 47.5650, -122.3900),
+    ("Brookside", 47.7200, -122.3100),
+]
+
+def install_geo_index(engine: Engine):
+    """Create the spatial index for the current dialect and backfill it if new"""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == 'sqlite':
+            is_new = not inspect(conn).has_table('listings_rtree')
+            for statement in SQLITE_GEO_DDL:
+                conn.execute(text(statement))
+            if is_new:
+                for statement in SQLITE_GEO_REBUILD:
+                    conn.execute(text(statement))
+        elif dialect == 'postgresql':
+            for statement in POSTGRES_GEO_DDL:
+                conn.execute(text(statement))
+
+@contextmanager
+def geo_triggers_suspended(conn: Connection):
+    """Drop the SQLite R*Tree triggers around a bulk load and rebuild the index once at the end"""
+    if conn.dialect.name != 'sqlite' or not inspect(conn).has_table('listings_rtree'):
+        yield
+        return
+    for trigger in ('listings_rtree_ai', 'listings_rtree_ad', 'listings_rtree_au'):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    conn.commit()
+    try:
+        yield
+    finally:
+        for statement in SQLITE_GEO_REBUILD + SQLITE_GEO_DDL[1:]:
+            conn.execute(text(statement))
+        conn.commit()
+
+def parse_point(value: str) -> Tuple[float, float]:
+    """Parse "lat,lng", raising ValueError if malformed or out of range"""
+    parts = value.split(',')
+    if len(parts) != 2:
+        raise ValueError("Expected lat,lng")
+    lat, lng = (float(part) for part in parts)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("Coordinates out of range")
+    return lat, lng
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parse "min_lng,min_lat,max_lng,max_lat", raising ValueError if malformed or out of range"""
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError("Expected min_lng,min_lat,max_lng,max_lat")
+    min_lng, min_lat, max_lng, max_lat = (float(part) for part in parts)
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        raise ValueError("Invalid bounding box")
+    return min_lng, min_lat, max_lng, max_lat
+
+def radius_bbox(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """The (min_lng, min_lat, max_lng, max_lat) box enclosing a circle"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlng = radius_km / (KM_PER_DEGREE_LNG * max(math.cos(math.radians(lat)), 0.01))
+    return max(lng - dlng, -180.0), max(lat - dlat, -90.0), min(lng + dlng, 180.0), min(lat + dlat, 90.0)
+
+def distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def _is_dense(query: Query, in_box) -> bool:
+    capped = select(listings_rtree.c.id).where(*in_box).limit(SQLITE_DENSE_AREA_ROWS).subquery()
+    return query.session.execute(select(func.count()).select_from(capped)).scalar() >= SQLITE_DENSE_AREA_ROWS
+
+def _apply_bbox(query: Query, bbox: Tuple[float, float, float, float], dialect: str,
+                use_index: Optional[bool]) -> Query:
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if dialect == 'sqlite':
+        in_box = (
+            listings_rtree.c.max_lat >= min_lat, listings_rtree.c.min_lat <= max_lat,
+            listings_rtree.c.max_lng >= min_lng, listings_rtree.c.min_lng <= max_lng
+        )
+        if use_index or (use_index is None and not _is_dense(query, in_box)):
+            # An IN subquery rather than a join, so the R*Tree drives the lookup
+            # instead of being probed once per row of the status index
+            query = query.filter(Listing.id.in_(select(listings_rtree.c.id).where(*in_box)))
+    elif dialect == 'postgresql':
+        box = func.box(func.point(min_lng, min_lat), func.point(max_lng, max_lat))
+        query = query.filter(
+            Listing.latitude.isnot(None), Listing.longitude.isnot(None),
+            func.point(Listing.longitude, Listing.latitude).op('<@')(box)
+        )
+    return query.filter(
+        Listing.latitude.between(min_lat, max_lat),
+        Listing.longitude.between(min_lng, max_lng)
+    )
+
+def apply_geo_filter(query: Query, dialect: str, near: Optional[Tuple[float, float]] = None,
+                     radius_km: Optional[float] = None,
+                     bbox: Optional[Tuple[float, float, float, float]] = None,
+                     use_index: Optional[bool] = None) -> Tuple[Query, Optional[object]]:
+    """Filter a listings query to a radius around `near` and/or a bounding box.
+
+    The spatial index narrows candidates to the enclosing box; the radius is
+    then checked with an equirectangular approximation, accurate to well
+    under 1% at city scale. On SQLite the index is skipped for dense areas
+    unless use_index is True. Returns the filtered query and an ORDER BY
+    expression for nearest first, or None without `near`.
+    """
+    boxes = [bbox] if bbox is not None else []
+    if near is not None and radius_km is not None:
+        boxes.append(radius_bbox(near[0], near[1], radius_km))
+    if boxes:
+        # With both a box and a circle the index only needs their overlap
+        query = _apply_bbox(query, (
+            max(box[0] for box in boxes), max(box[1] for box in boxes),
+            min(box[2] for box in boxes), min(box[3] for box in boxes)
+        ), dialect, use_index)
+    if near is None:
+        return query, None
+
+    lat, lng = near
+    # Squared distance in km², with cos(lat) computed here so the SQL needs no trig functions
+    dx = (Listing.longitude - lng) * (KM_PER_DEGREE_LNG * math.cos(math.radians(lat)))
+    dy = (Listing.latitude - lat) * KM_PER_DEGREE_LAT
+    squared_distance = dx * dx + dy * dy
+    if radius_km is not None:
+        query = query.filter(squared_distance <= radius_km * radius_km)
+    else:
+        query = query.filter(Listing.latitude.isnot(None), Listing.longitude.isnot(None))
+    return query, squared_distance
+
+def nearest(query: Query, dialect: str, near: Tuple[float, float], radius_km: float,
+            bbox: Optional[Tuple[float, float, float, float]] = None, count: int = 20,
+            start_km: float = 0.25) -> list:
+    """The `count` listings nearest to `near` within `radius_km`, closest first.
+
+    Searches outward in growing circles until one holds `count` matches, so
+    the rows sorted are proportional to `count` rather than to the area.
+    Anything outside a circle is farther than everything inside it, so the
+    first full circle holds the true nearest matches.
+    """
+    radius = min(start_km, radius_km)
+    while True:
+        filtered, distance = apply_geo_filter(query, dialect, near, radius, bbox, use_index=True)
+        rows = filtered.order_by(distance, Listing.id).limit(count).all()
+        if len(rows) >= count or radius >= radius_km:
+            return rows
+        radius = min(radius * 4, radius_km)
+
+def geocode(db: Session, location: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Coordinates of the longest known place name contained in `location`, or None"""
+    if not location or not location.strip():
+        return None
+    needle = location.strip().lower()
+    place = db.query(Place.latitude, Place.longitude).filter(
+        func.lower(Place.name) == needle
+    ).first()
+    if place is None:
+        place = db.query(Place.latitude, Place.longitude).filter(
+            literal(needle).contains(func.lower(Place.name))
+        ).order_by(func.length(Place.name).desc()).first()
+    return (place[0], place[1]) if place else None
+
+def seed_places(conn: Connection) -> int:
+    """Insert the DEFAULT_PLACES that are missing. Returns the number added"""
+    existing = {name.lower() for name in conn.execute(select(Place.name)).scalars()}
+    rows = [
+        {'name': name, 'latitude': lat, 'longitude': lng}
+        for name, lat, lng in DEFAULT_PLACES if name.lower() not in existing
+    ]
+    if rows:
+        conn.execute(insert(Place), rows)
+    return len(rows)
+
+def backfill_listing_coordinates(conn: Connection, batch_size: int = 10000) -> int:
+    """Geocode listings without coordinates from the places table. Returns the number updated"""
+    places = sorted(
+        ((name.lower(), lat, lng) for name, lat, lng in conn.execute(select(Place.name, Place.latitude, Place.longitude))),
+        key=lambda place: -len(place[0])
+    )
+    updated = 0
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            select(Listing.id, Listing.location)
+            .where(Listing.id > after_id, Listing.latitude.is_(None))
+            .order_by(Listing.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        after_id = rows[-1][0]
+        coordinates = []
+        for listing_id, location in rows:
+            needle = (location or '').strip().lower()
+            match = next((place for place in places if place[0] == needle), None) or \
+                next((place for place in places if place[0] in needle), None)
+            if match:
+                coordinates.append({'listing_id': listing_id, 'lat': match[1], 'lng': match[2]})
+        if coordinates:
+            conn.execute(
+                Listing.__table__.update()
+                .where(Listing.__table__.c.id == bindparam('listing_id'))
+                .values(latitude=bindparam('lat'), longitude=bindparam('lng')),
+                coordinates
+            )
+        updated += len(coordinates)
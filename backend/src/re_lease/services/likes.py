@@ -0,0 +1,102 @@
+from typing import Dict, Iterable, Set, Tuple
+from sqlalchemy import delete, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..cache import listings_generation
+from ..models.listings import Listing, liked_listings
+
+def _insert_ignoring_duplicates(dialect: str):
+    if dialect == 'postgresql':
+        return postgresql.insert(liked_listings)
+    return sqlite.insert(liked_listings)
+
+def _adjust_like_counts(db: Session, listing_ids: Iterable[int], delta: int):
+    listing_ids = list(listing_ids)
+    if listing_ids:
+        db.execute(
+            update(Listing).where(Listing.id.in_(listing_ids))
+            .values(like_count=Listing.like_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+def add_likes(db: Session, user_id: int, listing_ids: Iterable[int]) -> Set[int]:
+    """Like listings that exist and are not liked yet; returns the newly liked ids. Does not commit"""
+    listing_ids = set(listing_ids)
+    if not listing_ids:
+        return set()
+    # Existing listings only, and a duplicate is a no-op rather than an error
+    statement = _insert_ignoring_duplicates(db.get_bind().dialect.name).from_select(
+        ['user_id', 'listing_id'],
+        select(literal(user_id), Listing.id).where(Listing.id.in_(listing_ids))
+    ).on_conflict_do_nothing().returning(liked_listings.c.listing_id)
+    added = set(db.execute(statement).scalars())
+    _adjust_like_counts(db, added, 1)
+    return added
+
+def remove_likes(db: Session, user_id: int, listing_ids: Iterable[int]) -> Set[int]:
+    """Unlike listings; returns the ids that were liked. Does not commit"""
+    listing_ids = set(listing_ids)
+    if not listing_ids:
+        return set()
+    removed = set(db.execute(
+        delete(liked_listings).where(
+            liked_listings.c.user_id == user_id,
+            liked_listings.c.listing_id.in_(listing_ids)
+        ).returning(liked_listings.c.listing_id)
+    ).scalars())
+    _adjust_like_counts(db, removed, -1)
+    return removed
+
+def add_like(db: Session, user_id: int, listing_id: int) -> bool:
+    """Like a listing. False if it was already liked or does not exist"""
+    added = add_likes(db, user_id, [listing_id])
+    db.commit()
+    if added:
+        # Cached pages carry like_count
+        listings_generation.bump()
+    return bool(added)
+
+def remove_like(db: Session, user_id: int, listing_id: int) -> bool:
+    """Unlike a listing. False if it was not liked"""
+    removed = remove_likes(db, user_id, [listing_id])
+    db.commit()
+    if removed:
+        listings_generation.bump()
+    return bool(removed)
+
+def set_likes(db: Session, user_id: int, changes: Dict[int, bool]) -> Tuple[Set[int], Set[int], Set[int]]:
+    """Apply {listing_id: liked} in one transaction.
+
+    Returns (liked, unliked, missing): the listings now liked and not liked
+    by the user, and ids with no listing.
+    """
+    existing = set(db.execute(select(Listing.id).where(Listing.id.in_(set(changes)))).scalars()) if changes else set()
+    liked = {listing_id for listing_id, like in changes.items() if like and listing_id in existing}
+    unliked = {listing_id for listing_id, like in changes.items() if not like and listing_id in existing}
+    changed = add_likes(db, user_id, liked) | remove_likes(db, user_id, unliked)
+    db.commit()
+    if changed:
+        listings_generation.bump()
+    return liked, unliked, set(changes) - existing
+
+def liked_listing_ids(db: Session, user_id: int, listing_ids: Iterable[int]) -> Set[int]:
+    """Which of the given listings the user has liked, in one query"""
+    listing_ids = set(listing_ids)
+    if not listing_ids:
+        return set()
+    return set(db.execute(
+        select(liked_listings.c.listing_id).where(
+            liked_listings.c.user_id == user_id,
+            liked_listings.c.listing_id.in_(listing_ids)
+        )
+    ).scalars())
+
+def backfill_like_counts(conn: Connection) -> int:
+    """Recount listings.like_count from liked_listings. Returns the number of listings with likes"""
+    likes = select(func.count()).where(liked_listings.c.listing_id == Listing.id).scalar_subquery()
+    return conn.execute(
+        update(Listing.__table__)
+        .where(Listing.id.in_(select(liked_listings.c.listing_id)))
+        .values(like_count=likes)
+    ).rowcount
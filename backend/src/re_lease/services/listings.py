@@ -1,30 +1,92 @@
+import base64
+import binascii
 import json
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc
-from ..models.listings import Listing, Message
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload, raiseload, aliased
+from sqlalchemy import and_, or_, delete, desc, tuple_, case, func, insert, literal_column, select, union_all, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from ..models.listings import Listing, Message, Conversation, liked_listings
 from ..models.users import User
-from ..schemas.listings import ListingCreate, ListingUpdate, MessageCreate
+from ..schemas.listings import ListingCreate, ListingUpdate, MessageCreate, MessageResponse
+from ..cache import listings_generation
+from .search import apply_search
+from .amenities import apply_amenity_filter, get_or_create_amenities
+from .geo import apply_geo_filter, geocode, nearest
+from .availability import apply_availability_filter
+from .counters import listing_counters
+from .realtime import message_hub
+
+# Loading policy for queries whose rows become ListingResponse objects: the
+# owner's username is serialized for every row, so it is joined in the same
+# SELECT; liked_by is never serialized and must not be lazy-loaded per row.
+LISTING_RESPONSE_OPTIONS = (
+    joinedload(Listing.user).load_only(User.username),
+    raiseload(Listing.liked_by),
+    raiseload(Listing.amenity_set),
+)
 
 def create_listing(db: Session, listing_data: ListingCreate, user_id: int) -> Listing:
     """Create a new listing"""
+    amenities = get_or_create_amenities(db, listing_data.amenities)
+    if listing_data.latitude is not None and listing_data.longitude is not None:
+        coordinates = (listing_data.latitude, listing_data.longitude)
+    else:
+        coordinates = geocode(db, listing_data.location) or (None, None)
     db_listing = Listing(
         title=listing_data.title,
         description=listing_data.description,
         price=listing_data.price,
         location=listing_data.location,
+        latitude=coordinates[0],
+        longitude=coordinates[1],
         bedrooms=listing_data.bedrooms,
         bathrooms=listing_data.bathrooms,
         available_from=listing_data.available_from,
-        amenities=json.dumps(listing_data.amenities) if listing_data.amenities else None,
+        available_to=listing_data.available_to,
+        amenities=json.dumps([amenity.name for amenity in amenities]) if amenities else None,
         images=json.dumps(listing_data.images) if listing_data.images else None,
-        user_id=user_id
+        user_id=user_id,
+        amenity_set=amenities
     )
     db.add(db_listing)
     db.commit()
+    listings_generation.bump()
     db.refresh(db_listing)
     return db_listing
 
+# Inline rather than bound, so the planner can use the partial indexes on
+# active listings (models.listings.ACTIVE_LISTINGS)
+ACTIVE = literal_column("'active'")
+
+# Keyset sort orders for browsing. Ids are assigned in insert order, so
+# "newest" is served straight from the ix_listings_active_id index.
+LISTING_SORTS = ('newest', 'price_asc', 'price_desc')
+
+def _sort_key(sort: str, listing: Listing) -> list:
+    if sort == 'newest':
+        return [listing.id]
+    return [listing.price, listing.id]
+
+def encode_listing_cursor(sort: str, listing: Listing) -> str:
+    """Build an opaque cursor pointing just past the given listing"""
+    payload = json.dumps([sort, *_sort_key(sort, listing)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_listing_cursor(cursor: str) -> Tuple[str, list]:
+    """Decode a cursor into its sort order and sort key, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort, *key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if sort not in LISTING_SORTS or len(key) != (1 if sort == 'newest' else 2):
+        raise ValueError("Invalid cursor")
+    if not all(isinstance(value, (int, float)) for value in key):
+        raise ValueError("Invalid cursor")
+    return sort, key
+
 def get_listings(
     db: Session, 
     skip: int = 0, 
@@ -33,20 +95,28 @@ def get_listings(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     location: Optional[str] = None,
-    bedrooms: Optional[int] = None
+    bedrooms: Optional[int] = None,
+    amenities: Optional[List[str]] = None,
+    move_in: Optional[date] = None,
+    move_out: Optional[date] = None,
+    near: Optional[Tuple[float, float]] = None,
+    radius_km: Optional[float] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    sort: str = 'newest',
+    after: Optional[list] = None
 ) -> List[Listing]:
-    """Get listings with optional filters"""
-    query = db.query(Listing).filter(Listing.status == 'active')
+    """Get listings with optional filters.
+
+    sort is 'relevance' (search results only, falls back to newest),
+    'distance' (nearest to `near` first) or one of LISTING_SORTS. Passing
+    the sort key from a decoded cursor as `after` switches to keyset
+    pagination and ignores skip.
+    """
+    query = db.query(Listing).options(*LISTING_RESPONSE_OPTIONS).filter(Listing.status == ACTIVE)
     
+    rank = None
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Listing.title.ilike(search_term),
-                Listing.description.ilike(search_term),
-                Listing.location.ilike(search_term)
-            )
-        )
+        query, rank = apply_search(query, search, db.get_bind().dialect.name)
     
     if min_price is not None:
         query = query.filter(Listing.price >= min_price)
@@ -60,18 +130,77 @@ def get_listings(
     if bedrooms is not None:
         query = query.filter(Listing.bedrooms == bedrooms)
     
+    if amenities:
+        query = apply_amenity_filter(query, db, amenities)
+    
+    dialect = db.get_bind().dialect.name
+    if move_in is not None or move_out is not None:
+        query = apply_availability_filter(query, dialect, move_in, move_out)
+    
+    if sort == 'distance' and near is not None and radius_km is not None:
+        return nearest(query, dialect, near, radius_km, bbox, count=skip + limit)[skip:]
+    
+    distance = None
+    if near is not None or bbox is not None:
+        query, distance = apply_geo_filter(query, dialect, near, radius_km, bbox)
+    
+    if sort == 'distance':
+        if distance is not None:
+            return query.order_by(distance, Listing.id).offset(skip).limit(limit).all()
+        sort = 'newest'
+    
+    if sort == 'relevance':
+        if rank is not None:
+            return query.order_by(rank, Listing.id).offset(skip).limit(limit).all()
+        sort = 'newest'
+    
+    if sort == 'newest':
+        if after:
+            query = query.filter(Listing.id < after[0])
+        query = query.order_by(desc(Listing.id))
+    elif sort == 'price_asc':
+        if after:
+            query = query.filter(tuple_(Listing.price, Listing.id) > tuple_(*after))
+        query = query.order_by(Listing.price, Listing.id)
+    else:
+        if after:
+            query = query.filter(tuple_(Listing.price, Listing.id) < tuple_(*after))
+        query = query.order_by(desc(Listing.price), desc(Listing.id))
+    
+    if after:
+        return query.limit(limit).all()
     return query.offset(skip).limit(limit).all()
 
 def get_listing_by_id(db: Session, listing_id: int) -> Optional[Listing]:
     """Get a specific listing by ID"""
-    return db.query(Listing).filter(Listing.id == listing_id).first()
+    return db.query(Listing).options(
+        joinedload(Listing.user).load_only(User.username)
+    ).filter(Listing.id == listing_id).first()
+
+def get_listings_by_ids(db: Session, listing_ids: List[int]) -> List[Listing]:
+    """Get the listings with the given ids in one query, in the order given. Unknown ids are skipped"""
+    if not listing_ids:
+        return []
+    by_id = {
+        listing.id: listing
+        for listing in db.query(Listing).options(*LISTING_RESPONSE_OPTIONS).filter(Listing.id.in_(listing_ids))
+    }
+    return [by_id[listing_id] for listing_id in listing_ids if listing_id in by_id]
 
 def get_user_listings(db: Session, user_id: int) -> List[Listing]:
     """Get all listings created by a specific user"""
-    return db.query(Listing).filter(Listing.user_id == user_id).order_by(desc(Listing.created_at)).all()
+    return db.query(Listing).options(*LISTING_RESPONSE_OPTIONS).filter(
+        Listing.user_id == user_id
+    ).order_by(desc(Listing.created_at)).all()
+
+def get_user_liked_listings(db: Session, user_id: int) -> List[Listing]:
+    """Get all listings liked by a specific user"""
+    return db.query(Listing).options(*LISTING_RESPONSE_OPTIONS).join(
+        liked_listings, liked_listings.c.listing_id == Listing.id
+    ).filter(liked_listings.c.user_id == user_id).all()
 
 def update_listing(db: Session, listing_id: int, listing_data: ListingUpdate, user_id: int) -> Optional[Listing]:
-    """Update a listing"""
+    """Update a listing, raising ValueError if its availability would end before it starts"""
     db_listing = db.query(Listing).filter(
         and_(Listing.id == listing_id, Listing.user_id == user_id)
     ).first()
@@ -80,17 +209,25 @@ def update_listing(db: Session, listing_id: int, listing_data: ListingUpdate, us
         return None
     
     update_data = listing_data.dict(exclude_unset=True)
+    available_from = update_data.get('available_from') or db_listing.available_from
+    available_to = update_data['available_to'] if 'available_to' in update_data else db_listing.available_to
+    if available_to is not None and available_to < available_from:
+        raise ValueError("available_to must not be before available_from")
     
     # Handle JSON fields
     if 'amenities' in update_data:
-        update_data['amenities'] = json.dumps(update_data['amenities'])
+        db_listing.amenity_set = get_or_create_amenities(db, update_data['amenities'])
+        update_data['amenities'] = json.dumps([amenity.name for amenity in db_listing.amenity_set])
     if 'images' in update_data:
         update_data['images'] = json.dumps(update_data['images'])
+    if 'location' in update_data and 'latitude' not in update_data and 'longitude' not in update_data:
+        update_data['latitude'], update_data['longitude'] = geocode(db, update_data['location']) or (None, None)
     
     for field, value in update_data.items():
         setattr(db_listing, field, value)
     
     db.commit()
+    listings_generation.bump()
     db.refresh(db_listing)
     return db_listing
 
@@ -105,25 +242,26 @@ def delete_listing(db: Session, listing_id: int, user_id: int) -> bool:
     
     db.delete(db_listing)
     db.commit()
+    listings_generation.bump()
     return True
 
-def increment_listing_views(db: Session, listing_id: int):
-    """Increment the view count for a listing"""
-    db_listing = db.query(Listing).filter(Listing.id == listing_id).first()
-    if db_listing:
-        db_listing.views += 1
-        db.commit()
+def increment_listing_views(listing_id: int):
+    """Increment the view count for a listing (written on the next counter flush)"""
+    listing_counters.add(listing_id, 'views')
 
-def increment_listing_interested(db: Session, listing_id: int):
-    """Increment the interested count for a listing"""
-    db_listing = db.query(Listing).filter(Listing.id == listing_id).first()
-    if db_listing:
-        db_listing.interested += 1
-        db.commit()
+def increment_listing_interested(listing_id: int):
+    """Increment the interested count for a listing (written on the next counter flush)"""
+    listing_counters.add(listing_id, 'interested')
+
+def get_listing_counts(listing: Listing) -> Tuple[int, int]:
+    """Current (views, interested) for a listing, including unflushed increments"""
+    views, interested = listing_counters.pending(listing.id)
+    return (listing.views or 0) + views, (listing.interested or 0) + interested
 
 # Message functions
-def create_message(db: Session, message_data: MessageCreate, sender_id: int) -> Message:
-    """Create a new message"""
+def create_message(db: Session, message_data: MessageCreate, sender_id: int,
+                   usernames: Optional[Dict[int, str]] = None) -> Message:
+    """Create a new message. usernames (by id) of the participants, if known, save a lookup when publishing it"""
     db_message = Message(
         text=message_data.text,
         sender_id=sender_id,
@@ -131,83 +269,254 @@ def create_message(db: Session, message_data: MessageCreate, sender_id: int) ->
         listing_id=message_data.listing_id
     )
     db.add(db_message)
+    conversation = _get_or_create_conversation(db, sender_id, message_data.receiver_id, message_data.listing_id)
+    db.flush()
+    db.refresh(db_message)
+    
+    # Bump the receiver's unread counter and move the snapshot forward,
+    # unless a newer message in the same thread got there first
+    unread = _unread_column(conversation, message_data.receiver_id)
+    is_newer = or_(Conversation.last_message_id.is_(None), Conversation.last_message_id < db_message.id)
+    unread_count = db.execute(update(Conversation).where(Conversation.id == conversation.id).values({
+        unread: unread + 1,
+        Conversation.last_message_id: case((is_newer, db_message.id), else_=Conversation.last_message_id),
+        Conversation.last_message_text: case((is_newer, db_message.text), else_=Conversation.last_message_text),
+        Conversation.last_message_at: case((is_newer, db_message.created_at), else_=Conversation.last_message_at),
+    }).returning(unread).execution_options(synchronize_session=False)).scalar()
+    
     db.commit()
     db.refresh(db_message)
+    _publish_new_message(db, db_message, unread_count, usernames)
     return db_message
 
-def get_conversation_messages(db: Session, user1_id: int, user2_id: int, listing_id: int) -> List[Message]:
-    """Get messages between two users for a specific listing"""
-    return db.query(Message).options(
-        joinedload(Message.sender),
-        joinedload(Message.receiver)
-    ).filter(
-        and_(
-            Message.listing_id == listing_id,
-            or_(
-                and_(Message.sender_id == user1_id, Message.receiver_id == user2_id),
-                and_(Message.sender_id == user2_id, Message.receiver_id == user1_id)
+def _get_or_create_conversation(db: Session, user_a: int, user_b: int, listing_id: int) -> Conversation:
+    """Find the inbox row for a thread, creating it on the first message"""
+    user_low, user_high = sorted((user_a, user_b))
+    thread = and_(
+        Conversation.user_low_id == user_low,
+        Conversation.user_high_id == user_high,
+        Conversation.listing_id == listing_id
+    )
+    conversation = db.query(Conversation).filter(thread).first()
+    if conversation:
+        return conversation
+    try:
+        with db.begin_nested():
+            conversation = Conversation(
+                user_low_id=user_low,
+                user_high_id=user_high,
+                listing_id=listing_id,
+                unread_low=0,
+                unread_high=0
             )
+            db.add(conversation)
+    except IntegrityError:
+        # Another request opened the same thread concurrently
+        conversation = db.query(Conversation).filter(thread).one()
+    return conversation
+
+def _unread_column(conversation: Conversation, user_id: int):
+    """The unread counter column belonging to one participant"""
+    return Conversation.unread_low if conversation.user_low_id == user_id else Conversation.unread_high
+
+# Default and largest page of conversation history
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+def get_usernames(db: Session, user_ids: Iterable[int]) -> Dict[int, str]:
+    """Usernames by id for a handful of users"""
+    return dict(db.query(User.id, User.username).filter(User.id.in_(set(user_ids))).all())
+
+def _publish_unread_count(db: Session, user_id: int, other_user_id: int, listing_id: int):
+    """Push a participant's current unread count for one thread"""
+    user_low, user_high = sorted((user_id, other_user_id))
+    unread = Conversation.unread_low if user_id == user_low else Conversation.unread_high
+    count = db.query(unread).filter(
+        and_(
+            Conversation.user_low_id == user_low,
+            Conversation.user_high_id == user_high,
+            Conversation.listing_id == listing_id
+        )
+    ).scalar()
+    message_hub.publish(user_id, {
+        'type': 'unread', 'listing_id': listing_id, 'other_user_id': other_user_id, 'unread_count': count or 0
+    })
+
+def _publish_new_message(db: Session, message: Message, unread_count: int,
+                         usernames: Optional[Dict[int, str]] = None):
+    """Push a committed message to both participants, and the receiver's new unread count"""
+    if not message_hub.listening(message.receiver_id, message.sender_id):
+        return
+    if usernames is None:
+        usernames = get_usernames(db, (message.sender_id, message.receiver_id))
+    payload = MessageResponse(
+        id=message.id,
+        text=message.text,
+        sender_id=message.sender_id,
+        receiver_id=message.receiver_id,
+        listing_id=message.listing_id,
+        is_read=message.is_read,
+        created_at=message.created_at,
+        sender_username=usernames.get(message.sender_id, "Unknown"),
+        receiver_username=usernames.get(message.receiver_id, "Unknown")
+    ).model_dump(mode='json')
+    # The sender's other devices see it too
+    for user_id in (message.receiver_id, message.sender_id):
+        message_hub.publish(user_id, {'type': 'message', 'message': payload})
+    message_hub.publish(message.receiver_id, {
+        'type': 'unread', 'listing_id': message.listing_id, 'other_user_id': message.sender_id,
+        'unread_count': unread_count
+    })
+
+def get_conversation_messages(
+    db: Session,
+    user1_id: int,
+    user2_id: int,
+    listing_id: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = MESSAGE_PAGE_SIZE
+) -> List[Message]:
+    """Get one page of messages between two users for a listing, oldest first.
+
+    With after_id, the oldest `limit` messages newer than it (polling for new
+    messages); otherwise the newest `limit` messages, older than before_id if
+    given (scrolling back). Sender and receiver are not loaded.
+    """
+    newest_first = after_id is None
+    # One keyset page per direction, each read in id order from the thread
+    # index, then merged: the OR of both directions would sort the whole thread
+    pages = []
+    for sender_id, receiver_id in ((user1_id, user2_id), (user2_id, user1_id)):
+        page = select(Message.id).where(
+            Message.sender_id == sender_id,
+            Message.receiver_id == receiver_id,
+            Message.listing_id == listing_id
         )
-    ).order_by(Message.created_at).all()
+        if after_id is not None:
+            page = page.where(Message.id > after_id)
+        if before_id is not None:
+            page = page.where(Message.id < before_id)
+        page = page.order_by(desc(Message.id) if newest_first else Message.id).limit(limit).subquery()
+        pages.append(select(page.c.id))
+    page_ids = union_all(*pages).subquery()
+    
+    messages = db.query(Message).options(
+        raiseload(Message.sender),
+        raiseload(Message.receiver)
+    ).filter(
+        Message.id.in_(select(page_ids.c.id))
+    ).order_by(desc(Message.id) if newest_first else Message.id).limit(limit).all()
+    if newest_first:
+        messages.reverse()
+    return messages
 
 def get_user_conversations(db: Session, user_id: int) -> List[dict]:
-    """Get all conversations for a user"""
-    # Get all messages where user is sender or receiver
-    messages = db.query(Message).filter(
-        or_(Message.sender_id == user_id, Message.receiver_id == user_id)
-    ).order_by(desc(Message.created_at)).all()
-    
-    conversations = {}
-    
-    for message in messages:
-        # Determine the other user in the conversation
-        other_user_id = message.receiver_id if message.sender_id == user_id else message.sender_id
-        
-        # Create a unique conversation key
-        conv_key = f"{min(user_id, other_user_id)}_{max(user_id, other_user_id)}_{message.listing_id}"
-        
-        if conv_key not in conversations:
-            # Get the other user's info
-            other_user = db.query(User).filter(User.id == other_user_id).first()
-            listing = db.query(Listing).filter(Listing.id == message.listing_id).first()
-            
-            conversations[conv_key] = {
-                'other_user_id': other_user_id,
-                'other_user_name': other_user.username if other_user else "Unknown",
-                'listing_id': message.listing_id,
-                'listing_title': listing.title if listing else "Unknown Listing",
-                'last_message': message.text,
-                'last_message_time': message.created_at,
-                'unread_count': 0
-            }
-        else:
-            # Update with more recent message if this one is newer
-            if message.created_at > conversations[conv_key]['last_message_time']:
-                conversations[conv_key]['last_message'] = message.text
-                conversations[conv_key]['last_message_time'] = message.created_at
-    
-    # Count unread messages
-    for conv_key, conv in conversations.items():
-        unread_count = db.query(Message).filter(
+    """Get all conversations for a user, newest first"""
+    is_low = Conversation.user_low_id == user_id
+    other_user_id = case((is_low, Conversation.user_high_id), else_=Conversation.user_low_id)
+    unread_count = case((is_low, Conversation.unread_low), else_=Conversation.unread_high)
+    other_user = aliased(User)
+    
+    rows = db.query(
+        Conversation, other_user_id, unread_count, other_user.username, Listing.title
+    ).outerjoin(
+        other_user, other_user.id == other_user_id
+    ).outerjoin(
+        Listing, Listing.id == Conversation.listing_id
+    ).filter(
+        or_(Conversation.user_low_id == user_id, Conversation.user_high_id == user_id),
+        Conversation.last_message_id.isnot(None)
+    ).order_by(desc(Conversation.last_message_at), desc(Conversation.last_message_id)).all()
+    
+    return [
+        {
+            'other_user_id': other_id,
+            'other_user_name': username or "Unknown",
+            'listing_id': conversation.listing_id,
+            'listing_title': title or "Unknown Listing",
+            'last_message': conversation.last_message_text,
+            'last_message_time': conversation.last_message_at,
+            'unread_count': unread
+        }
+        for conversation, other_id, unread, username, title in rows
+    ]
+
+def mark_messages_as_read(db: Session, sender_id: int, receiver_id: int, listing_id: int,
+                          from_id: Optional[int] = None, up_to_id: Optional[int] = None):
+    """Mark messages as read, only those with ids in [from_id, up_to_id] (the range delivered) if given"""
+    unread_messages = and_(
+        Message.sender_id == sender_id,
+        Message.receiver_id == receiver_id,
+        Message.listing_id == listing_id,
+        Message.is_read == False
+    )
+    if from_id is not None:
+        unread_messages = and_(unread_messages, Message.id >= from_id)
+    if up_to_id is not None:
+        unread_messages = and_(unread_messages, Message.id <= up_to_id)
+    marked = db.query(Message).filter(unread_messages).update({"is_read": True})
+    
+    if marked:
+        user_low, user_high = sorted((sender_id, receiver_id))
+        unread = Conversation.unread_low if receiver_id == user_low else Conversation.unread_high
+        db.query(Conversation).filter(
             and_(
-                Message.receiver_id == user_id,
-                Message.sender_id == conv['other_user_id'],
-                Message.listing_id == conv['listing_id'],
-                Message.is_read == False
+                Conversation.user_low_id == user_low,
+                Conversation.user_high_id == user_high,
+                Conversation.listing_id == listing_id
             )
-        ).count()
-        conv['unread_count'] = unread_count
+        ).update({unread: case((unread > marked, unread - marked), else_=0)}, synchronize_session=False)
+    db.commit()
     
-    return list(conversations.values())
+    # Read receipt for the sender, new unread count for the reader
+    if marked and message_hub.listening(sender_id):
+        message_hub.publish(sender_id, {
+            'type': 'read', 'listing_id': listing_id, 'reader_id': receiver_id, 'count': marked,
+            'from_id': from_id, 'up_to_id': up_to_id
+        })
+    if marked and message_hub.listening(receiver_id):
+        _publish_unread_count(db, receiver_id, sender_id, listing_id)
 
-def mark_messages_as_read(db: Session, sender_id: int, receiver_id: int, listing_id: int):
-    """Mark messages as read"""
-    db.query(Message).filter(
-        and_(
-            Message.sender_id == sender_id,
-            Message.receiver_id == receiver_id,
-            Message.listing_id == listing_id,
-            Message.is_read == False
-        )
-    ).update({"is_read": True})
-    db.commit() 
\ No newline at end of file
+def rebuild_conversations(db: Session, batch_size: int = 1000) -> int:
+    """Rebuild the conversations table from messages. Returns the number of threads"""
+    count = backfill_conversations(db.connection(), batch_size)
+    db.commit()
+    return count
+
+def backfill_conversations(conn: Connection, batch_size: int = 1000) -> int:
+    """Replace the conversations table's rows with one per message thread. Does not commit"""
+    sender_is_low = Message.sender_id < Message.receiver_id
+    user_low = case((sender_is_low, Message.sender_id), else_=Message.receiver_id)
+    user_high = case((sender_is_low, Message.receiver_id), else_=Message.sender_id)
+    unread = Message.is_read == False
+    
+    threads = conn.execute(select(
+        user_low, user_high, Message.listing_id, func.max(Message.id),
+        func.sum(case((and_(unread, Message.receiver_id == user_low), 1), else_=0)),
+        func.sum(case((and_(unread, Message.receiver_id == user_high), 1), else_=0))
+    ).group_by(user_low, user_high, Message.listing_id)).all()
+    
+    conn.execute(delete(Conversation))
+    for start in range(0, len(threads), batch_size):
+        batch = threads[start:start + batch_size]
+        last_messages = {
+            message_id: (text, created_at)
+            for message_id, text, created_at in conn.execute(
+                select(Message.id, Message.text, Message.created_at).where(Message.id.in_([thread[3] for thread in batch]))
+            )
+        }
+        conn.execute(insert(Conversation), [
+            {
+                'user_low_id': low,
+                'user_high_id': high,
+                'listing_id': listing_id,
+                'last_message_id': last_id,
+                'last_message_text': last_messages[last_id][0],
+                'last_message_at': last_messages[last_id][1],
+                'unread_low': unread_low or 0,
+                'unread_high': unread_high or 0
+            }
+            for low, high, listing_id, last_id, unread_low, unread_high in batch
+        ])
+    return len(threads) 
\ No newline at end of file
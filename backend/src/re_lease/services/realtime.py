@@ -0,0 +1,324 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from typing import Callable, Dict, Optional, Protocol, Set
+import anyio
+from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy.engine import make_url
+from ..database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per connection before it counts as a slow consumer
+REALTIME_QUEUE_SIZE = int(os.getenv('REALTIME_QUEUE_SIZE', '100'))
+# Longest a single send may take before the connection counts as stalled
+REALTIME_SEND_TIMEOUT = float(os.getenv('REALTIME_SEND_TIMEOUT', '10'))
+# Postgres NOTIFY channel shared by all workers when REALTIME_BROKER=postgres
+REALTIME_CHANNEL = os.getenv('REALTIME_CHANNEL', 're_lease_events')
+# How long closing a stalled connection may take before it is abandoned
+REALTIME_CLOSE_TIMEOUT = float(os.getenv('REALTIME_CLOSE_TIMEOUT', '1.0'))
+# NOTIFY payloads must stay under 8000 bytes
+POSTGRES_NOTIFY_LIMIT = 7900
+
+# Close code sent to a consumer that fell behind: reconnect and refetch
+# what was missed over HTTP
+CLOSE_TRY_AGAIN_LATER = 1013
+
+_OVERFLOW = object()
+
+Deliver = Callable[[int, dict], None]
+
+class MessageBroker(Protocol):
+    """Carries events from the worker that published them to every worker.
+
+    `deliver(user_id, event)` hands an event to this worker's connections.
+    `local_only` brokers never reach other workers, so events for users with
+    no connection here can be skipped.
+    """
+    local_only: bool
+
+    def start(self, deliver: Deliver): ...
+    def publish(self, user_id: int, event: dict): ...
+    def stop(self): ...
+
+class LocalBroker:
+    """Delivers within this process only (a single worker)"""
+    local_only = True
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    def publish(self, user_id: int, event: dict):
+        if self._deliver is not None:
+            self._deliver(user_id, event)
+
+    def stop(self):
+        self._deliver = None
+
+class PostgresBroker:
+    """Fans events out to every worker through Postgres LISTEN/NOTIFY.
+
+    Uses two connections of its own, outside the SQLAlchemy pool: one
+    sends NOTIFY in autocommit mode, the other LISTENs on a background
+    thread and reconnects if it drops.
+    """
+    local_only = False
+
+    def __init__(self, dsn: str, channel: str = REALTIME_CHANNEL, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._deliver: Optional[Deliver] = None
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def start(self, deliver: Deliver):
+        if self._thread is not None:
+            return
+        self._deliver = deliver
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='realtime-listener', daemon=True)
+        self._thread.start()
+
+    def publish(self, user_id: int, event: dict):
+        payload = json.dumps({'user_id': user_id, 'event': event}, separators=(',', ':'))
+        if len(payload.encode()) > POSTGRES_NOTIFY_LIMIT:
+            # Too large to carry; tell the client to fetch it instead
+            payload = json.dumps({'user_id': user_id, 'event': {**_summary(event), 'truncated': True}})
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect()
+                    with self._publisher.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    return
+                except Exception:
+                    # Retry once on a fresh connection, e.g. after a server restart
+                    self._close_publisher()
+                    if attempt:
+                        raise
+
+    def _close_publisher(self):
+        if self._publisher is not None:
+            try:
+                self._publisher.close()
+            except Exception:
+                pass
+            self._publisher = None
+
+    def _listen(self):
+        conn = self._connect()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    message = json.loads(notify.payload)
+                    self._deliver(message['user_id'], message['event'])
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Realtime listener error, reconnecting")
+                self._stop.wait(self.reconnect_delay)
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        with self._publish_lock:
+            self._close_publisher()
+
+def _summary(event: dict) -> dict:
+    """An event without its message body"""
+    summary = dict(event)
+    if 'message' in summary:
+        summary['message'] = {key: value for key, value in summary['message'].items() if key != 'text'}
+    return summary
+
+def broker_from_env() -> MessageBroker:
+    """Build the broker selected by REALTIME_BROKER (local or postgres)"""
+    if os.getenv('REALTIME_BROKER', 'local') == 'postgres':
+        url = make_url(os.getenv('REALTIME_DATABASE_URL', DATABASE_URL)).set(drivername='postgresql')
+        return PostgresBroker(url.render_as_string(hide_password=False))
+    return LocalBroker()
+
+class Subscriber:
+    """One WebSocket connection's bounded queue of pending events"""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def offer(self, event: dict):
+        """Queue an event; runs on the connection's event loop"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Events are lost from here on, so stop sending any: the client
+            # is told to reconnect and catch up instead
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_OVERFLOW)
+
+class MessageHub:
+    """Pushes message events to the WebSocket connections of this worker.
+
+    Publishing never blocks: each connection has a bounded queue and a
+    consumer that falls more than `queue_size` events behind, or takes
+    longer than `send_timeout` to accept one, is disconnected with close
+    code 1013 rather than slowing down the publisher or growing memory.
+    """
+
+    def __init__(self, broker_factory=broker_from_env, queue_size: int = REALTIME_QUEUE_SIZE,
+                 send_timeout: float = REALTIME_SEND_TIMEOUT):
+        self.broker_factory = broker_factory
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._broker: Optional[MessageBroker] = None
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._lock = threading.Lock()
+        self.delivered = 0
+        self.disconnected_slow = 0
+
+    def start(self):
+        if self._broker is not None:
+            return
+        self._broker = self.broker_factory()
+        self._broker.start(self.deliver)
+
+    def stop(self):
+        if self._broker is not None:
+            self._broker.stop()
+            self._broker = None
+
+    @property
+    def active(self) -> bool:
+        """Whether events are being published at all (the hub is started)"""
+        return self._broker is not None
+
+    def listening(self, *user_ids: int) -> bool:
+        """Whether an event for any of these users could reach a connection, here or on another worker"""
+        broker = self._broker
+        if broker is None:
+            return False
+        if not broker.local_only:
+            return True
+        with self._lock:
+            return any(user_id in self._subscribers for user_id in user_ids)
+
+    def publish(self, user_id: int, event: dict):
+        """Send an event to every connection of a user, on any worker"""
+        if self._broker is None:
+            return
+        try:
+            self._broker.publish(user_id, event)
+        except Exception:
+            # Clients catch up over HTTP; never fail the write that published
+            logger.exception("Error publishing realtime event")
+
+    def deliver(self, user_id: int, event: dict):
+        """Hand an event to this worker's connections for a user. Thread-safe"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.delivered += len(subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # The connection's loop has shut down
+                pass
+
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _register(self, user_id: int) -> Subscriber:
+        subscriber = Subscriber(user_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def _unregister(self, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    async def _send(self, websocket: WebSocket, subscriber: Subscriber):
+        while True:
+            event = await subscriber.queue.get()
+            if event is _OVERFLOW:
+                break
+            try:
+                await asyncio.wait_for(websocket.send_json(event), self.send_timeout)
+            except asyncio.TimeoutError:
+                break
+            except (WebSocketDisconnect, RuntimeError):
+                # Closed by the client while sending
+                return
+        with self._lock:
+            self.disconnected_slow += 1
+        try:
+            # The socket may be as stalled as the send was
+            await asyncio.wait_for(
+                websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason='Consumer too slow'), REALTIME_CLOSE_TIMEOUT
+            )
+        except (asyncio.TimeoutError, WebSocketDisconnect, RuntimeError):
+            pass
+
+    async def _receive(self, websocket: WebSocket):
+        # Clients only listen; reading keeps pings answered and notices disconnects
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    async def serve(self, websocket: WebSocket, user_id: int):
+        """Stream a user's events to an accepted WebSocket until either side closes"""
+        subscriber = self._register(user_id)
+        try:
+            async with anyio.create_task_group() as tasks:
+                async def until_done(part, *args):
+                    await part(*args)
+                    tasks.cancel_scope.cancel()
+
+                tasks.start_soon(until_done, self._send, websocket, subscriber)
+                tasks.start_soon(until_done, self._receive, websocket)
+        finally:
+            self._unregister(subscriber)
+
+message_hub = MessageHub()
@@ -0,0 +1,130 @@
+import re
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from sqlalchemy import text, func, or_, inspect, literal_column, table, column
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Query
+from ..models.listings import Listing
+
+# SQLite: FTS5 external-content table over listings, kept in sync by triggers
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+        title, description, location,
+        content='listings', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN
+        INSERT INTO listings_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE OF title, description, location ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO listings_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+]
+
+# Postgres: weighted tsvector maintained by the database as a generated column
+POSTGRES_SEARCH_DDL = [
+    """
+    ALTER TABLE listings ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(location, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_listings_search_vector ON listings USING GIN (search_vector)",
+]
+
+# bm25() column weights for title, description, location
+SQLITE_BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+listings_fts = table('listings_fts', column('rowid'), column('listings_fts'))
+search_vector = literal_column('listings.search_vector')
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def install_search_index(engine: Engine):
+    """Create the full-text index for the current dialect and backfill it if new"""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == 'sqlite':
+            is_new = not inspect(conn).has_table('listings_fts')
+            for statement in SQLITE_SEARCH_DDL:
+                conn.execute(text(statement))
+            if is_new:
+                conn.execute(text("INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')"))
+        elif dialect == 'postgresql':
+            for statement in POSTGRES_SEARCH_DDL:
+                conn.execute(text(statement))
+
+@contextmanager
+def search_triggers_suspended(conn: Connection):
+    """Drop the SQLite FTS triggers around a bulk load and rebuild the index once at the end"""
+    if conn.dialect.name != 'sqlite' or not inspect(conn).has_table('listings_fts'):
+        yield
+        return
+    for trigger in ('listings_fts_ai', 'listings_fts_ad', 'listings_fts_au'):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.execute(text("INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')"))
+        for statement in SQLITE_SEARCH_DDL[1:]:
+            conn.execute(text(statement))
+        conn.commit()
+
+def search_terms(search: str) -> list:
+    """Split a free-text search into index tokens"""
+    return _TOKEN_RE.findall(search.lower())
+
+def apply_ilike_search(query: Query, search: str) -> Query:
+    """Substring search over title, description and location (unindexed)"""
+    search_term = f"%{search}%"
+    return query.filter(
+        or_(
+            Listing.title.ilike(search_term),
+            Listing.description.ilike(search_term),
+            Listing.location.ilike(search_term)
+        )
+    )
+
+def apply_search(query: Query, search: str, dialect: str) -> Tuple[Query, Optional[object]]:
+    """Filter a listings query by full-text search.
+
+    Every term is prefix-matched and all terms must match. Returns the
+    filtered query and an ORDER BY expression ranking the best match first,
+    or None when the dialect has no full-text index.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return query, None
+
+    if dialect == 'sqlite':
+        match = " ".join(f'"{term}"*' for term in terms)
+        query = query.join(listings_fts, listings_fts.c.rowid == Listing.id).filter(
+            listings_fts.c.listings_fts.op('MATCH')(match)
+        )
+        return query, func.bm25(literal_column('listings_fts'), *SQLITE_BM25_WEIGHTS)
+
+    if dialect == 'postgresql':
+        ts_query = func.to_tsquery('english', " & ".join(f"{term}:*" for term in terms))
+        query = query.filter(search_vector.op('@@')(ts_query))
+        return query, func.ts_rank_cd(search_vector, ts_query).desc()
+
+    return apply_ilike_search(query, search), None
@@ -3,7 +3,7 @@ from jose import jwt
 from dotenv import load_dotenv
 import os
 from re_lease.models.users import User
-from re_lease.deps import bcrypt_context
+from re_lease.passwords import password_hasher
 
 
 load_dotenv()
@@ -16,8 +16,13 @@ def authenticate_user(username: str, password: str, db):
     user = db.query(User).filter(User.username == username).first()
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.password_hash):
+    valid, new_hash = password_hasher.verify_and_update(password, user.password_hash)
+    if not valid:
         return False
+    if new_hash:
+        # Stored hash predates the current bcrypt cost; upgrade it
+        user.password_hash = new_hash
+        db.commit()
     return user
 
 def create_access_token(username: str, user_id: int, expires_delta: timedelta):
@@ -0,0 +1,293 @@
+"""Deterministic bulk data for load and scale testing.
+
+    python -m re_lease.cli generate --users 50000 --listings 1000000 --messages 10000000
+
+Rows are streamed in batches, with executemany on SQLite and COPY on
+Postgres, and are appended after whatever the database already holds.
+The same --seed against the same starting database produces the same rows.
+"""
+import csv
+import io
+import json
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, Sequence
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from .models.users import User
+from .models.listings import Listing, Message, liked_listings
+from .passwords import bcrypt_context
+from .services.listings import rebuild_conversations
+from .services.search import search_triggers_suspended
+from .services.geo import DEFAULT_PLACES, geo_triggers_suspended
+from .services.amenities import backfill_listing_amenities
+from .services.likes import backfill_like_counts
+
+SYNTHETIC_PASSWORD = 'password123'
+
+AMENITIES = ["WiFi", "Parking", "Kitchen", "Laundry", "Gym", "Pool", "Air Conditioning", "Heating"]
+NEIGHBORHOODS = [
+    "Downtown", "Midtown", "University District", "Northside", "Southside", "East Village",
+    "West End", "Old Town", "Riverside", "Harbor", "Hillcrest", "Lakeview", "Greenwood",
+    "Capitol Hill", "Fremont", "Ballard", "Uptown", "Arts District", "Chinatown", "Mission",
+    "Oak Park", "Maple Heights", "Cedar Grove", "Pine Ridge", "Westwood", "Eastgate",
+    "Parkside", "Bayview", "Sunset", "Brookside",
+]
+PROPERTY_TYPES = ["Studio", "Apartment", "Loft", "Room", "House", "Townhouse", "Condo", "Suite"]
+ADJECTIVES = [
+    "Sunny", "Quiet", "Spacious", "Cozy", "Modern", "Bright", "Renovated", "Furnished",
+    "Charming", "Affordable", "Luxury", "Shared", "Private", "Clean", "Updated",
+]
+FEATURES = [
+    "near campus", "with parking", "by the park", "close to transit", "with balcony",
+    "with backyard", "downtown", "with city views", "pet friendly", "walk to campus",
+    "near the hospital", "by the lake", "with in-unit laundry", "near grocery stores",
+]
+DESCRIPTION_SENTENCES = [
+    "Hardwood floors throughout and plenty of natural light.",
+    "Utilities are included in the rent.",
+    "The kitchen was renovated last year with new appliances.",
+    "Five minutes from the bus stop and bike lanes.",
+    "Roommates are students and keep a quiet household.",
+    "Street parking is easy to find in the evenings.",
+    "Large closet and extra storage in the basement.",
+    "Shared backyard with a grill and garden.",
+    "Building has a gym and a rooftop terrace.",
+    "Laundry is on site and the landlord is responsive.",
+    "Furniture can stay if you want it.",
+    "Available for a summer sublet with an option to extend.",
+    "Walking distance to cafes, restaurants and the farmers market.",
+    "Heating and air conditioning keep it comfortable year round.",
+    "Pets are welcome with a small deposit.",
+]
+MESSAGE_TEXTS = [
+    "Hi, is this place still available?",
+    "Yes, it is! When would you like to move in?",
+    "Would it be possible to schedule a viewing this week?",
+    "Sure, does Thursday afternoon work for you?",
+    "Are utilities included in the price?",
+    "Is the price negotiable for a longer stay?",
+    "Can I bring my cat?",
+    "Thanks! I'll let you know by the weekend.",
+    "How far is it from campus?",
+    "Is parking included?",
+    "Sounds great, I'm interested.",
+    "Sorry, it has already been taken.",
+]
+
+def _zipf_weights(count: int) -> list:
+    return list(accumulate(1.0 / rank for rank in range(1, count + 1)))
+
+NEIGHBORHOOD_WEIGHTS = _zipf_weights(len(NEIGHBORHOODS))
+NEIGHBORHOOD_COORDINATES = {name: (lat, lng) for name, lat, lng in DEFAULT_PLACES}
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+def _copy_rows(conn: Connection, table: Table, columns: Sequence[str], rows: Iterable[tuple], batch_size: int) -> int:
+    """Stream rows into Postgres with COPY ... FROM STDIN"""
+    conn.commit()
+    # COPY bypasses SQLAlchemy, so commit on the driver connection itself
+    dbapi_connection = conn.connection.dbapi_connection
+    cursor = dbapi_connection.cursor()
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    count = 0
+    for batch in _batches(rows, batch_size):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+        dbapi_connection.commit()
+        count += len(batch)
+    cursor.close()
+    return count
+
+def bulk_insert(conn: Connection, table: Table, columns: Sequence[str], rows: Iterable[tuple], batch_size: int) -> int:
+    """Insert rows (tuples in `columns` order) in batches, committing after each. Returns the row count"""
+    if conn.dialect.name == 'postgresql':
+        return _copy_rows(conn, table, columns, rows, batch_size)
+    statement = table.insert()
+    count = 0
+    for batch in _batches(rows, batch_size):
+        conn.execute(statement, [dict(zip(columns, row)) for row in batch])
+        conn.commit()
+        count += len(batch)
+    return count
+
+def _next_id(conn: Connection, table: Table) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+def _reset_sequence(conn: Connection, table: Table):
+    # COPY with explicit ids does not advance the serial sequence
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), (SELECT max(id) FROM {table.name}))"
+        ))
+        conn.commit()
+
+def _user_rows(first_id: int, count: int, password_hash: str) -> Iterator[tuple]:
+    for user_id in range(first_id, first_id + count):
+        yield (user_id, f"user{user_id}", f"user{user_id}@example.com", password_hash, None, True)
+
+def _listing_rows(rng: random.Random, first_id: int, count: int, user_ids: array, now: datetime) -> Iterator[tuple]:
+    span = timedelta(days=365).total_seconds()
+    for offset in range(count):
+        bedrooms = rng.choices((1, 2, 3, 4, 5), cum_weights=(30, 65, 85, 95, 100))[0]
+        # created_at grows with id so the newest-first sort matches insertion order
+        created_at = now - timedelta(seconds=span * (count - offset) / count)
+        neighborhood = rng.choices(NEIGHBORHOODS, cum_weights=NEIGHBORHOOD_WEIGHTS)[0]
+        # Scatter around the neighborhood centre, roughly a kilometre either way
+        lat, lng = NEIGHBORHOOD_COORDINATES[neighborhood]
+        # Available within two months of posting: mostly sublets of one to
+        # four months, some longer leases and a few open-ended ones
+        available_from = datetime.combine((created_at + timedelta(days=rng.randint(0, 60))).date(), datetime.min.time())
+        term = rng.choice((1, 2, 3, 3, 4, 6, 12))
+        available_to = None if rng.random() < 0.05 else available_from + timedelta(days=30 * term)
+        yield (
+            first_id + offset,
+            f"{rng.choice(ADJECTIVES)} {bedrooms}BR {rng.choice(PROPERTY_TYPES)} {rng.choice(FEATURES)}",
+            " ".join(rng.sample(DESCRIPTION_SENTENCES, rng.randint(2, 5))),
+            round(rng.lognormvariate(7.0, 0.4) / 25) * 25,
+            neighborhood,
+            round(lat + rng.gauss(0, 0.01), 6),
+            round(lng + rng.gauss(0, 0.014), 6),
+            bedrooms,
+            rng.choice((1.0, 1.0, 1.5, 2.0, 2.5, 3.0)),
+            available_from,
+            available_to,
+            json.dumps(rng.sample(AMENITIES, rng.randint(1, 5))),
+            json.dumps([f"https://picsum.photos/seed/{first_id + offset}-{n}/800/600" for n in range(rng.randint(1, 4))]),
+            rng.choices(('active', 'pending', 'rented'), cum_weights=(85, 95, 100))[0],
+            int(rng.paretovariate(1.2)) - 1,
+            int(rng.paretovariate(1.5)) - 1,
+            created_at,
+            rng.choice(user_ids),
+        )
+
+def _like_rows(rng: random.Random, user_ids: array, listing_ids: array, likes_per_user: int) -> Iterator[tuple]:
+    for user_id in user_ids:
+        count = min(rng.randint(0, 2 * likes_per_user), len(listing_ids))
+        for listing_id in sorted(rng.sample(listing_ids, count)):
+            yield (user_id, listing_id)
+
+def _message_rows(rng: random.Random, first_id: int, count: int, user_ids: array,
+                  listing_ids: array, listing_owners: array, now: datetime) -> Iterator[tuple]:
+    """Threads of back-and-forth messages between an inquirer and a listing's owner"""
+    message_id = first_id
+    remaining = count
+    while remaining:
+        listing_index = rng.randrange(len(listing_ids))
+        owner = listing_owners[listing_index]
+        inquirer = rng.choice(user_ids)
+        if inquirer == owner:
+            continue
+        size = min(remaining, 1 + int(rng.expovariate(1 / 7)))
+        unread = rng.choice((0, 0, 0, 1, 2))
+        sent_at = now - timedelta(days=365 * rng.random())
+        sender, receiver = inquirer, owner
+        for position in range(size):
+            yield (
+                message_id, rng.choice(MESSAGE_TEXTS), sender, receiver,
+                listing_ids[listing_index], position < size - unread, sent_at
+            )
+            message_id += 1
+            sent_at += timedelta(minutes=rng.randint(1, 240))
+            sender, receiver = receiver, sender
+        remaining -= size
+
+def _report(name: str, count: int, start: float):
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f} rows/s)")
+
+def generate(engine: Engine, users: int = 0, listings: int = 0, likes_per_user: int = 0,
+             messages: int = 0, seed: int = 0, batch_size: int = 10000):
+    """Append synthetic users, listings, likes and message threads to the database"""
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    users_table, listings_table, messages_table = User.__table__, Listing.__table__, Message.__table__
+
+    with engine.connect() as conn:
+        if users:
+            start = time.perf_counter()
+            # One hash for everyone: bcrypt would otherwise dominate the run
+            password_hash = bcrypt_context.hash(SYNTHETIC_PASSWORD)
+            count = bulk_insert(
+                conn, users_table, ('id', 'username', 'email', 'password_hash', 'bio', 'verified'),
+                _user_rows(_next_id(conn, users_table), users, password_hash), batch_size
+            )
+            _reset_sequence(conn, users_table)
+            _report('users', count, start)
+        user_ids = array('q', conn.execute(select(users_table.c.id).order_by(users_table.c.id)).scalars())
+
+        if listings:
+            if not user_ids:
+                raise ValueError("listings need at least one user")
+            start = time.perf_counter()
+            first_listing_id = _next_id(conn, listings_table)
+            with search_triggers_suspended(conn), geo_triggers_suspended(conn):
+                count = bulk_insert(
+                    conn, listings_table,
+                    ('id', 'title', 'description', 'price', 'location', 'latitude', 'longitude', 'bedrooms',
+                     'bathrooms', 'available_from', 'available_to', 'amenities', 'images', 'status', 'views',
+                     'interested', 'created_at', 'user_id'),
+                    _listing_rows(rng, first_listing_id, listings, user_ids, now), batch_size
+                )
+            _reset_sequence(conn, listings_table)
+            _report('listings', count, start)
+
+            start = time.perf_counter()
+            count = backfill_listing_amenities(conn, after_id=first_listing_id - 1, batch_size=batch_size)
+            conn.commit()
+            _report('listing_amenities', count, start)
+
+        listing_ids, listing_owners = array('q'), array('q')
+        if likes_per_user or messages:
+            for listing_id, owner_id in conn.execute(
+                select(listings_table.c.id, listings_table.c.user_id).order_by(listings_table.c.id)
+            ):
+                listing_ids.append(listing_id)
+                listing_owners.append(owner_id)
+            if not listing_ids or len(user_ids) < 2:
+                raise ValueError("likes and messages need listings and at least two users")
+
+        if likes_per_user:
+            start = time.perf_counter()
+            # Only users without likes yet, so re-runs never hit the primary key
+            users_with_likes = set(conn.execute(select(liked_listings.c.user_id).distinct()).scalars())
+            likers = array('q', (user_id for user_id in user_ids if user_id not in users_with_likes))
+            count = bulk_insert(
+                conn, liked_listings, ('user_id', 'listing_id'),
+                _like_rows(rng, likers, listing_ids, likes_per_user), batch_size
+            )
+            backfill_like_counts(conn)
+            conn.commit()
+            _report('liked_listings', count, start)
+
+        if messages:
+            start = time.perf_counter()
+            count = bulk_insert(
+                conn, messages_table,
+                ('id', 'text', 'sender_id', 'receiver_id', 'listing_id', 'is_read', 'created_at'),
+                _message_rows(rng, _next_id(conn, messages_table), messages, user_ids, listing_ids, listing_owners, now),
+                batch_size
+            )
+            _reset_sequence(conn, messages_table)
+            _report('messages', count, start)
+
+    if messages:
+        start = time.perf_counter()
+        with Session(engine) as db:
+            count = rebuild_conversations(db, batch_size=batch_size)
+        _report('conversations', count, start)
+
+    # Planner statistics for the bulk-loaded tables: without them SQLite
+    # prefers the status indexes over the far more selective R*Tree lookup
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.commit()
@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+from typing import List, Union
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from .database import engine as default_engine
+
+class StatementLog:
+    """SQL statements executed while a count_statements block is active"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_statements(bind: Union[Engine, Connection] = default_engine):
+    """Record every SQL statement executed through `bind` inside the block.
+
+    An engine also sees the background workers' statements (counter
+    flushes, the email sender); pass a Connection to count only its own.
+    """
+    log = StatementLog()
+    event.listen(bind, 'before_cursor_execute', log)
+    try:
+        yield log
+    finally:
+        event.remove(bind, 'before_cursor_execute', log)
+
+@contextmanager
+def assert_max_statements(limit: int, bind: Union[Engine, Connection] = default_engine):
+    """Fail with AssertionError if the block executes more than `limit` SQL statements.
+
+    Use around a test client call to pin an endpoint's query budget, with
+    the app's sessions bound to `connection` (see tests/conftest.py), e.g.
+
+        with assert_max_statements(2, connection):
+            client.get('/listings/')
+    """
+    with count_statements(bind) as log:
+        yield log
+    if log.count > limit:
+        statements = "\n".join(f"  {i + 1}. {statement}" for i, statement in enumerate(log.statements))
+        raise AssertionError(f"Expected at most {limit} SQL statements, got {log.count}:\n{statements}")
@@ -0,0 +1,80 @@
+import os
+import tempfile
+from datetime import timedelta
+
+# Configure the app before anything imports it: a throwaway database and no
+# background email delivery
+_database_dir = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_database_dir.name, 'test.db')}"
+os.environ.setdefault('AUTH_SECRET_KEY', 'test-secret')
+os.environ.setdefault('AUTH_ALGORITHM', 'HS256')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ['EMAIL_SENDER_ENABLED'] = 'false'
+os.environ['AUTO_MIGRATE'] = 'false'
+os.environ['WARMUP_ON_STARTUP'] = 'false'
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from re_lease.cache import listing_page_cache, principal_cache
+from re_lease.database import engine
+from re_lease.deps import Principal, get_db
+from re_lease.main import app
+from re_lease.migrations import migrate
+from re_lease.models.listings import Listing
+from re_lease.models.users import User
+from re_lease.services.likes import add_likes
+from re_lease.services.users import create_access_token
+from re_lease.synthetic_data import generate
+
+
+@pytest.fixture(scope='session')
+def client():
+    migrate(engine)
+    # Enough rows that the planner prefers indexes, as on a real database
+    generate(engine, users=40, listings=2000, messages=2000, seed=1)
+    with TestClient(app) as test_client:
+        yield test_client
+    engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def user(client) -> Principal:
+    """The first synthetic user, with 13 liked listings among the newest"""
+    with Session(engine) as db:
+        user = Principal.from_user(db.query(User).order_by(User.id).first())
+        newest = db.query(func.max(Listing.id)).scalar()
+        add_likes(db, user.id, range(newest - 38, newest + 1, 3))
+        db.commit()
+        return user
+
+
+@pytest.fixture
+def auth_headers(user) -> dict:
+    token = create_access_token(user.username, user.id, timedelta(minutes=5))
+    return {'Authorization': f"Bearer {token}"}
+
+
+@pytest.fixture
+def connection(client):
+    """A connection every request's session is bound to, for counting only the app's statements.
+
+    Caches are cleared so each test sees the cold path.
+    """
+    listing_page_cache.clear()
+    principal_cache.clear()
+    with engine.connect() as connection:
+        def get_test_db():
+            db = Session(bind=connection)
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = get_test_db
+        try:
+            yield connection
+        finally:
+            del app.dependency_overrides[get_db]
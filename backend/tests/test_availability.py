@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from re_lease.cache import listings_generation
+from re_lease.database import engine
+from re_lease.models.listings import Listing
+
+LOCATION = 'Availability Test'
+
+# Name: (available_from, available_to)
+WINDOWS = {
+    'january': (datetime(2026, 1, 1), datetime(2026, 1, 31)),
+    'march': (datetime(2026, 3, 1), datetime(2026, 3, 31)),
+    'from_may': (datetime(2026, 5, 1), None),
+}
+
+
+@pytest.fixture(scope='module')
+def listing_names(client, user) -> dict:
+    """Listings with known availability windows, by id"""
+    with Session(engine) as db:
+        listings = {
+            name: Listing(
+                title=name, description='Availability window', price=1000, location=LOCATION,
+                bedrooms=1, bathrooms=1, available_from=available_from, available_to=available_to,
+                user_id=user.id
+            )
+            for name, (available_from, available_to) in WINDOWS.items()
+        }
+        db.add_all(listings.values())
+        db.commit()
+        names = {listing.id: name for name, listing in listings.items()}
+    listings_generation.bump()
+    return names
+
+
+def search(client, listing_names, **stay) -> set:
+    response = client.get('/listings/', params={'location': LOCATION, **stay})
+    assert response.status_code == 200
+    return {listing_names[listing['id']] for listing in response.json()}
+
+
+@pytest.mark.parametrize('stay, expected', [
+    # Open-ended available_to matches any stay from its start on
+    ({'move_in': '2027-06-01', 'move_out': '2027-06-30'}, {'from_may'}),
+    ({'move_in': '2027-06-01'}, {'from_may'}),
+    # move_in only: still available on or after that day
+    ({'move_in': '2026-03-15'}, {'march', 'from_may'}),
+    ({'move_in': '2026-03-31'}, {'march', 'from_may'}),
+    ({'move_in': '2026-04-01'}, {'from_may'}),
+    # move_out only: available at some point up to and including that day
+    ({'move_out': '2026-02-15'}, {'january'}),
+    ({'move_out': '2026-03-01'}, {'january', 'march'}),
+    # move_out the day before available_from does not overlap; on the day it does
+    ({'move_in': '2026-04-01', 'move_out': '2026-04-30'}, set()),
+    ({'move_in': '2026-04-01', 'move_out': '2026-05-01'}, {'from_may'}),
+    ({'move_in': '2026-01-20', 'move_out': '2026-02-28'}, {'january'}),
+])
+def test_stay_overlaps_availability(client, listing_names, stay, expected):
+    assert search(client, listing_names, **stay) == expected
+
+
+def test_move_out_before_move_in(client):
+    response = client.get('/listings/', params={'move_in': '2026-03-10', 'move_out': '2026-03-09'})
+    assert response.status_code == 400
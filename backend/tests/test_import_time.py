@@ -0,0 +1,6 @@
+from re_lease.cli import IMPORT_TIME_BUDGET, measure_import_time
+
+
+def test_import_time_within_budget():
+    best = measure_import_time(runs=3)
+    assert best <= IMPORT_TIME_BUDGET, f"import re_lease.main took {best:.3f}s, budget {IMPORT_TIME_BUDGET:.3f}s"
@@ -0,0 +1,36 @@
+import pytest
+
+
+def like_count(client, listing_id: int) -> int:
+    page = client.get('/listings/', params={'limit': 100}).json()
+    return next(listing['like_count'] for listing in page if listing['id'] == listing_id)
+
+
+@pytest.fixture
+def unliked_listing(client, auth_headers):
+    """The newest listing, not liked by the user for the test and as it was afterwards"""
+    listing = client.get('/listings/', params={'limit': 1}, headers=auth_headers).json()[0]
+    client.post(f"/listings/{listing['id']}/unlike", headers=auth_headers)
+    yield listing['id']
+    client.post(f"/listings/{listing['id']}/{'like' if listing['liked_by_me'] else 'unlike'}", headers=auth_headers)
+
+
+def test_like_refreshes_cached_page(client, auth_headers, unliked_listing):
+    before = like_count(client, unliked_listing)
+
+    assert client.post(f'/listings/{unliked_listing}/like', headers=auth_headers).status_code == 200
+    assert like_count(client, unliked_listing) == before + 1
+
+    assert client.post(f'/listings/{unliked_listing}/unlike', headers=auth_headers).status_code == 200
+    assert like_count(client, unliked_listing) == before
+
+
+def test_batch_likes_refresh_cached_page(client, auth_headers, unliked_listing):
+    before = like_count(client, unliked_listing)
+
+    response = client.post(
+        '/listings/likes/batch', json={'changes': [{'listing_id': unliked_listing, 'liked': True}]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert like_count(client, unliked_listing) == before + 1
@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+from re_lease.services.users import create_access_token
+
+
+def test_browse_with_expired_token(client, user):
+    token = create_access_token(user.username, user.id, timedelta(minutes=-1))
+    response = client.get('/listings/', headers={'Authorization': f"Bearer {token}"})
+    assert response.status_code == 200
+    assert all(listing['liked_by_me'] is None for listing in response.json())
+
+
+def test_browse_with_invalid_token(client):
+    response = client.get('/listings/', headers={'Authorization': 'Bearer not-a-token'})
+    assert response.status_code == 200
@@ -0,0 +1,53 @@
+"""Statement budgets for the hot listing endpoints, on a cold cache.
+
+A failure lists the statements that ran; a new one per row is usually a
+relationship missing from LISTING_RESPONSE_OPTIONS.
+"""
+from re_lease.models.listings import Listing
+from re_lease.testing import assert_max_statements
+from sqlalchemy import select
+
+
+def test_browse_anonymous(client, connection):
+    with assert_max_statements(1, connection):
+        response = client.get('/listings/?limit=100')
+    assert response.status_code == 200
+    assert len(response.json()) == 100
+
+
+def test_browse_cached_page(client, connection):
+    client.get('/listings/?limit=100')
+    with assert_max_statements(0, connection):
+        response = client.get('/listings/?limit=100')
+    assert response.status_code == 200
+
+
+def test_browse_signed_in(client, connection, auth_headers):
+    # The page, the viewer and the viewer's likes on it
+    with assert_max_statements(3, connection):
+        response = client.get('/listings/?limit=100', headers=auth_headers)
+    assert response.status_code == 200
+    assert any(listing['liked_by_me'] for listing in response.json())
+
+
+def test_liked_listings(client, connection, auth_headers):
+    with assert_max_statements(2, connection):
+        response = client.get('/listings/liked', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 13
+
+
+def test_my_listings(client, connection, auth_headers, user):
+    with assert_max_statements(3, connection):
+        response = client.get('/listings/my/listings', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()
+    assert all(listing['user_id'] == user.id for listing in response.json())
+
+
+def test_listing_detail(client, connection, auth_headers):
+    listing_id = connection.execute(select(Listing.id).order_by(Listing.id.desc()).limit(1)).scalar()
+    with assert_max_statements(3, connection):
+        response = client.get(f'/listings/{listing_id}', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()['id'] == listing_id
@@ -0,0 +1,10 @@
+from re_lease.database import engine
+from re_lease.query_plans import HOT_QUERIES, check_plans
+
+
+def test_hot_queries_use_an_index(client, user):
+    # `user` adds the likes the liked-listing queries sample
+    results = check_plans(engine)
+    assert [name for name, _ in results] == [name for name, _ in HOT_QUERIES]
+    full_scans = {name: sorted(set(scans)) for name, scans in results if scans}
+    assert not full_scans, f"Hot queries reading a whole table: {full_scans}"